@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List
+
+from sqlmodel import Session, select
+
+from .catalog import get_catalog
+from .db import bump_catalog_version, get_session, refresh_read_replica
+from .models import CatalogChange, Exercise, Routine, RoutineExercise
+
+# Versiones de catalog_change que se conservan; un proceso que se quede más
+# atrás recarga el catálogo completo.
+CHANGE_RETENTION_VERSIONS = 1000
+
+
+# Cada escritura es una sola transacción: filas del catálogo, índices FTS (los
+# mantienen los triggers), versión del catálogo y registro del cambio (para
+# que cada proceso aplique solo el delta a su catálogo en memoria).
+
+
+def create_exercise(data: Dict[str, Any]) -> Dict[str, Any]:
+    with get_session() as session:
+        exercise = Exercise(**data)
+        session.add(exercise)
+        session.flush()
+        payload = exercise.model_dump()
+        version = _commit_change(session, exercises=[exercise.id])
+    return _written(payload, version)
+
+
+def update_exercise(exercise_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+    with get_session() as session:
+        exercise = _get_or_raise(session, Exercise, exercise_id)
+        for key, value in data.items():
+            setattr(exercise, key, value)
+        session.add(exercise)
+        session.flush()
+        payload = exercise.model_dump()
+        version = _commit_change(session, exercises=[exercise_id])
+    return _written(payload, version)
+
+
+def delete_exercise(exercise_id: int) -> Dict[str, Any]:
+    with get_session() as session:
+        exercise = _get_or_raise(session, Exercise, exercise_id)
+        links = _delete_links(session, RoutineExercise.exercise_id == exercise_id)
+        session.delete(exercise)
+        session.flush()
+        version = _commit_change(session, exercises=[exercise_id], links=links)
+    return _written({"id": exercise_id, "deleted_links": len(links)}, version)
+
+
+def create_routine(data: Dict[str, Any]) -> Dict[str, Any]:
+    with get_session() as session:
+        routine = Routine(**data)
+        session.add(routine)
+        session.flush()
+        payload = routine.model_dump()
+        version = _commit_change(session, routines=[routine.id])
+    return _written(payload, version)
+
+
+def update_routine(routine_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+    with get_session() as session:
+        routine = _get_or_raise(session, Routine, routine_id)
+        for key, value in data.items():
+            setattr(routine, key, value)
+        session.add(routine)
+        session.flush()
+        payload = routine.model_dump()
+        version = _commit_change(session, routines=[routine_id])
+    return _written(payload, version)
+
+
+def delete_routine(routine_id: int) -> Dict[str, Any]:
+    with get_session() as session:
+        routine = _get_or_raise(session, Routine, routine_id)
+        links = _delete_links(session, RoutineExercise.routine_id == routine_id)
+        session.delete(routine)
+        session.flush()
+        version = _commit_change(session, routines=[routine_id], links=links)
+    return _written({"id": routine_id, "deleted_links": len(links)}, version)
+
+
+def create_link(routine_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+    with get_session() as session:
+        _get_or_raise(session, Routine, routine_id)
+        _get_or_raise(session, Exercise, data["exercise_id"])
+        link = RoutineExercise(routine_id=routine_id, **data)
+        session.add(link)
+        session.flush()
+        payload = link.model_dump()
+        version = _commit_change(session, links=[link.id])
+    return _written(payload, version)
+
+
+def update_link(link_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+    with get_session() as session:
+        link = _get_or_raise(session, RoutineExercise, link_id)
+        if "exercise_id" in data:
+            _get_or_raise(session, Exercise, data["exercise_id"])
+        for key, value in data.items():
+            setattr(link, key, value)
+        session.add(link)
+        session.flush()
+        payload = link.model_dump()
+        version = _commit_change(session, links=[link_id])
+    return _written(payload, version)
+
+
+def delete_link(link_id: int) -> Dict[str, Any]:
+    with get_session() as session:
+        link = _get_or_raise(session, RoutineExercise, link_id)
+        session.delete(link)
+        session.flush()
+        version = _commit_change(session, links=[link_id])
+    return _written({"id": link_id}, version)
+
+
+def _get_or_raise(session: Session, model: Any, row_id: int) -> Any:
+    row = session.get(model, row_id)
+    if row is None:
+        raise LookupError(f"{model.__name__} {row_id} no existe.")
+    return row
+
+
+def _delete_links(session: Session, condition: Any) -> List[int]:
+    links = session.exec(select(RoutineExercise).where(condition)).all()
+    for link in links:
+        session.delete(link)
+    # Los enlaces se borran antes que su rutina o ejercicio (claves foráneas).
+    session.flush()
+    return [link.id for link in links]
+
+
+def _commit_change(
+    session: Session,
+    routines: Iterable[int] = (),
+    exercises: Iterable[int] = (),
+    links: Iterable[int] = (),
+) -> int:
+    version = bump_catalog_version(session)
+    for entity, ids in (("routine", routines), ("exercise", exercises), ("link", links)):
+        for entity_id in ids:
+            session.add(CatalogChange(version=version, entity=entity, entity_id=entity_id))
+    session.connection().exec_driver_sql(
+        "DELETE FROM catalog_change WHERE version <= ?;",
+        (version - CHANGE_RETENTION_VERSIONS,),
+    )
+    session.commit()
+    return version
+
+
+def _written(payload: Dict[str, Any], version: int) -> Dict[str, Any]:
+    # El catálogo de este proceso se pone al día aplicando el delta recién
+    # confirmado; el resto de procesos lo hará en su siguiente lectura.
+    refresh_read_replica()
+    get_catalog()
+    return {"ok": True, "item": payload, "catalog_version": version}
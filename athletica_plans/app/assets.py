@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import stat
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from .http_cache import REVALIDATE_CACHE_CONTROL
+
+try:  # Brotli es opcional: sin él solo se generan variantes gzip.
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+BUILD_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Extensión del fichero precomprimido por codificación, en orden de preferencia.
+PRECOMPRESSED_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".html", ".svg", ".json", ".txt"}
+
+
+def build_assets(static_dir: Path = STATIC_DIR) -> Dict[str, str]:
+    build_dir = static_dir / BUILD_DIRNAME
+    if build_dir.exists():
+        shutil.rmtree(build_dir)
+
+    manifest: Dict[str, str] = {}
+    for source in sorted(static_dir.rglob("*")):
+        if not source.is_file() or build_dir in source.parents:
+            continue
+        content = source.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        relative = source.relative_to(static_dir)
+        hashed = relative.with_name(f"{relative.stem}.{digest}{relative.suffix}")
+        target = build_dir / hashed
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        if relative.suffix in COMPRESSIBLE_SUFFIXES:
+            _write_precompressed(target, content)
+        manifest[relative.as_posix()] = (Path(BUILD_DIRNAME) / hashed).as_posix()
+
+    (build_dir / MANIFEST_NAME).write_text(
+        json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8"
+    )
+    return manifest
+
+
+def _write_precompressed(target: Path, content: bytes) -> None:
+    # mtime=0 para que el build sea reproducible byte a byte.
+    target.with_name(target.name + ".gz").write_bytes(
+        gzip.compress(content, compresslevel=9, mtime=0)
+    )
+    if brotli is not None:
+        target.with_name(target.name + ".br").write_bytes(
+            brotli.compress(content, quality=11)
+        )
+
+
+def load_manifest(static_dir: Path = STATIC_DIR) -> Dict[str, str]:
+    manifest_path = static_dir / BUILD_DIRNAME / MANIFEST_NAME
+    try:
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def static_url_for(manifest: Dict[str, str], prefix: str = "/static") -> Callable[[str], str]:
+    # Sin manifest (no se ha ejecutado el build) se sirven las rutas originales.
+    def static_url(path: str) -> str:
+        path = path.lstrip("/")
+        return f"{prefix}/{manifest.get(path, path)}"
+
+    return static_url
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> List[str]:
+    encodings: List[str] = []
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.append(name)
+    return encodings
+
+
+class CachedStaticFiles(StaticFiles):
+    def __init__(
+        self,
+        *args: Any,
+        cache_control: str = REVALIDATE_CACHE_CONTROL,
+        immutable_dir: str = BUILD_DIRNAME,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+        self.immutable_dir = immutable_dir
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            response = await self._precompressed_response(path, scope)
+            if response is not None:
+                return response
+        return await super().get_response(path, scope)
+
+    async def _precompressed_response(self, path: str, scope: Scope) -> Optional[Response]:
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding"))
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES:
+            if encoding not in encodings:
+                continue
+            try:
+                full_path, stat_result = await anyio.to_thread.run_sync(
+                    self.lookup_path, path + suffix
+                )
+            except (OSError, ValueError):
+                return None
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            response = FileResponse(
+                full_path,
+                stat_result=stat_result,
+                media_type=media_type,
+                headers={"Content-Encoding": encoding},
+            )
+            return self._finalize(path, response, scope)
+        return None
+
+    def file_response(
+        self,
+        full_path: str | os.PathLike[str],
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        relative = (
+            os.path.relpath(full_path, os.path.realpath(self.directory))
+            if self.directory
+            else ""
+        )
+        return self._finalize(relative, response, scope)
+
+    def _finalize(self, path: str, response: Response, scope: Scope) -> Response:
+        # Los ficheros con hash en el nombre nunca cambian de contenido.
+        path = path.replace(os.sep, "/")
+        if path.startswith(f"{self.immutable_dir}/"):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = self.cache_control
+        response.headers["Vary"] = "Accept-Encoding"
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def main() -> None:
+    manifest = build_assets()
+    for source, target in sorted(manifest.items()):
+        print(f"{source} -> {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+# Sin ATHLETICA_ADMIN_TOKEN no hay acceso de administración posible. Es un
+# único token de operador, válido para todos los tenants a propósito: los
+# gimnasios no administran su catálogo por separado.
+ADMIN_TOKEN_ENV = "ATHLETICA_ADMIN_TOKEN"
+
+
+def is_admin_token(provided: Optional[str]) -> bool:
+    admin_token = os.getenv(ADMIN_TOKEN_ENV, "")
+    if not admin_token or not provided:
+        return False
+    # En bytes: compare_digest no admite str con caracteres no ASCII.
+    return hmac.compare_digest(provided.encode(), admin_token.encode())
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Se requiere token de administración.")
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import copy
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Type, TypeVar
+
+from sqlmodel import Session, select
+
+from .db import get_catalog_version, get_read_session, tenant_cache
+from .models import CatalogChange, Exercise, Routine, RoutineExercise
+from .ranking import RoutineColumns
+
+LinkRow = Tuple[RoutineExercise, Exercise]
+# Memoria aproximada por fila cargada (medida con tracemalloc sobre el
+# catálogo de seed); solo sirve para acotar el LRU de tenants.
+CATALOG_ROW_BYTES = 1536
+SUBSTITUTE_BYTES = 256
+T = TypeVar("T")
+
+
+class Catalog:
+    # Instantánea en memoria de rutinas, ejercicios y enlaces para una versión
+    # concreta del catálogo. Es de solo lectura: ante un cambio se carga otra
+    # (completa o aplicando el delta sobre la anterior, ver 'patched').
+    def __init__(
+        self,
+        version: int,
+        routines: List[Routine],
+        exercises: List[Exercise],
+        links: List[RoutineExercise],
+    ) -> None:
+        self.version = version
+        self.exercises_version = version
+        self._index_routines(routines)
+        self.exercises: Dict[int, Exercise] = {
+            exercise.id: exercise for exercise in exercises if exercise.id is not None
+        }
+        self._index_exercises()
+        self.links: Dict[int, RoutineExercise] = {
+            link.id: link for link in links if link.id is not None
+        }
+        self.links_by_routine: Dict[int, List[LinkRow]] = self._group_links()
+
+    def _index_routines(self, routines: Iterable[Routine]) -> None:
+        self.routines = sorted(
+            (routine for routine in routines if routine.id is not None),
+            key=lambda routine: routine.id,
+        )
+        self.routines_by_id: Dict[int, Routine] = {
+            routine.id: routine for routine in self.routines
+        }
+        by_objective: Dict[str, List[Routine]] = defaultdict(list)
+        for routine in self.routines:
+            by_objective[routine.objective].append(routine)
+        self.routines_by_objective: Dict[str, List[Routine]] = dict(by_objective)
+        # Solo con NumPy y catálogos grandes; si no, ranking en Python.
+        self.columns: Optional[RoutineColumns] = RoutineColumns.build(self.routines)
+
+    def _index_exercises(self) -> None:
+        # Bit por contraindicación conocida; la máscara de un ejercicio es el
+        # OR de sus bits.
+        contraindications = sorted(
+            {
+                value.lower()
+                for exercise in self.exercises.values()
+                for value in (exercise.contraindications or [])
+            }
+        )
+        self.pathology_bits: Dict[str, int] = {
+            value: 1 << index for index, value in enumerate(contraindications)
+        }
+        self.exercise_masks: Dict[int, int] = {
+            exercise_id: self.pathology_mask(exercise.contraindications or [])
+            for exercise_id, exercise in self.exercises.items()
+        }
+        self.substitution_peers = self._build_substitution_peers()
+        # (ejercicio, máscara pedida) -> alternativas seguras; se rellena al
+        # pedirla, así que solo crece con las combinaciones realmente usadas.
+        self.substitutes: Dict[Tuple[int, int], Tuple[int, ...]] = {}
+
+    def _group_links(self, routine_ids: Optional[Set[int]] = None) -> Dict[int, List[LinkRow]]:
+        links = self.links.values()
+        if routine_ids is not None:
+            links = [link for link in links if link.routine_id in routine_ids]
+        by_routine: Dict[int, List[LinkRow]] = defaultdict(list)
+        for link in sorted(links, key=lambda item: (item.section, item.order_index)):
+            exercise = self.exercises.get(link.exercise_id)
+            if exercise is None:
+                continue
+            by_routine[link.routine_id].append((link, exercise))
+        return dict(by_routine)
+
+    def patched(
+        self,
+        version: int,
+        routines: Dict[int, Optional[Routine]],
+        exercises: Dict[int, Optional[Exercise]],
+        links: Dict[int, Optional[RoutineExercise]],
+    ) -> "Catalog":
+        # Nueva instantánea con solo las filas cambiadas (None = borrada). Lo
+        # que no toca el cambio se comparte con esta instancia, que sigue
+        # siendo válida para quien la esté usando.
+        catalog = copy.copy(self)
+        catalog.version = version
+
+        if routines:
+            by_id = dict(self.routines_by_id)
+            for routine_id, routine in routines.items():
+                _apply(by_id, routine_id, routine)
+            catalog._index_routines(by_id.values())
+
+        if exercises:
+            catalog.exercises = dict(self.exercises)
+            for exercise_id, exercise in exercises.items():
+                _apply(catalog.exercises, exercise_id, exercise)
+            catalog._index_exercises()
+            catalog.exercises_version = version
+
+        affected: Set[int] = set(routines)
+        if links:
+            catalog.links = dict(self.links)
+            for link_id, link in links.items():
+                previous = self.links.get(link_id)
+                if previous is not None:
+                    affected.add(previous.routine_id)
+                if link is not None:
+                    affected.add(link.routine_id)
+                _apply(catalog.links, link_id, link)
+        if exercises:
+            affected.update(
+                link.routine_id
+                for link in catalog.links.values()
+                if link.exercise_id in exercises
+            )
+        if affected:
+            catalog.links_by_routine = {
+                routine_id: rows
+                for routine_id, rows in self.links_by_routine.items()
+                if routine_id not in affected
+            }
+            catalog.links_by_routine.update(catalog._group_links(affected))
+        return catalog
+
+    def estimated_bytes(self) -> int:
+        rows = len(self.routines) + len(self.exercises) + len(self.links)
+        entries = len(self.substitution_peers) + len(self.substitutes)
+        return rows * CATALOG_ROW_BYTES + entries * SUBSTITUTE_BYTES
+
+    def pathology_mask(self, pathologies: Iterable[str]) -> int:
+        mask = 0
+        for value in pathologies:
+            mask |= self.pathology_bits.get(value.lower(), 0)
+        return mask
+
+    def _build_substitution_peers(self) -> Dict[int, Tuple[int, ...]]:
+        # Ejercicio con contraindicaciones -> ejercicios del mismo patrón,
+        # ordenados: menos contraindicaciones, duración más parecida, nombre.
+        # No depende del nº de contraindicaciones distintas del catálogo.
+        by_pattern: Dict[str, List[Exercise]] = defaultdict(list)
+        for exercise in self.exercises.values():
+            by_pattern[exercise.pattern].append(exercise)
+
+        peers_by_exercise: Dict[int, Tuple[int, ...]] = {}
+        for exercise_id, exercise in self.exercises.items():
+            if not self.exercise_masks[exercise_id]:
+                continue
+            peers = [peer for peer in by_pattern[exercise.pattern] if peer.id != exercise_id]
+            peers.sort(
+                key=lambda peer: (
+                    bin(self.exercise_masks[peer.id]).count("1"),
+                    abs((peer.minutes or 0) - (exercise.minutes or 0)),
+                    peer.name,
+                )
+            )
+            peers_by_exercise[exercise_id] = tuple(peer.id for peer in peers)
+        return peers_by_exercise
+
+    def _safe_substitutes(self, exercise_id: int, mask: int) -> Tuple[int, ...]:
+        # Solo hace falta sustituir si la máscara pedida excluye al ejercicio.
+        if not self.exercise_masks.get(exercise_id, 0) & mask:
+            return ()
+        key = (exercise_id, mask)
+        cached = self.substitutes.get(key)
+        if cached is None:
+            cached = tuple(
+                peer_id
+                for peer_id in self.substitution_peers.get(exercise_id, ())
+                if not self.exercise_masks[peer_id] & mask
+            )
+            self.substitutes[key] = cached
+        return cached
+
+    def substitute_for(
+        self,
+        exercise: Exercise,
+        pathologies: Iterable[str],
+        taken: Set[int],
+    ) -> Optional[Exercise]:
+        mask = self.pathology_mask(pathologies)
+        for candidate_id in self._safe_substitutes(exercise.id, mask):
+            if candidate_id not in taken:
+                return self.exercises[candidate_id]
+        return None
+
+    def routines_for(self, objectives: List[str]) -> List[Routine]:
+        wanted = set(objectives)
+        return [routine for routine in self.routines if routine.objective in wanted]
+
+    def links_for(self, routine_id: Optional[int]) -> List[LinkRow]:
+        if routine_id is None:
+            return []
+        return self.links_by_routine.get(routine_id, [])
+
+
+def _apply(rows: Dict[int, T], row_id: int, row: Optional[T]) -> None:
+    if row is None:
+        rows.pop(row_id, None)
+    else:
+        rows[row_id] = row
+
+
+def load_catalog(session: Session) -> Catalog:
+    version = get_catalog_version(session)
+    return Catalog(
+        version=version,
+        routines=list(session.exec(select(Routine)).all()),
+        exercises=list(session.exec(select(Exercise)).all()),
+        links=list(session.exec(select(RoutineExercise)).all()),
+    )
+
+
+def load_catalog_delta(session: Session, base: Catalog, version: int) -> Optional[Catalog]:
+    # Aplica sobre 'base' los cambios registrados en catalog_change. Si falta
+    # alguna versión intermedia (p.ej. un seed o cambios ya purgados) se
+    # devuelve None y el llamador recarga el catálogo completo.
+    if version <= base.version:
+        return None
+    changes = session.exec(
+        select(CatalogChange)
+        .where(CatalogChange.version > base.version)
+        .where(CatalogChange.version <= version)
+    ).all()
+    if {change.version for change in changes} != set(range(base.version + 1, version + 1)):
+        return None
+
+    ids: Dict[str, Set[int]] = defaultdict(set)
+    for change in changes:
+        ids[change.entity].add(change.entity_id)
+    rows = {
+        entity: _fetch_rows(session, model, ids.get(entity, set()))
+        for entity, model in (("routine", Routine), ("exercise", Exercise), ("link", RoutineExercise))
+    }
+    return base.patched(
+        version,
+        routines=rows["routine"],
+        exercises=rows["exercise"],
+        links=rows["link"],
+    )
+
+
+def _fetch_rows(session: Session, model: Type[T], ids: Set[int]) -> Dict[int, Optional[T]]:
+    if not ids:
+        return {}
+    found = {row.id: row for row in session.exec(select(model).where(model.id.in_(ids))).all()}
+    return {row_id: found.get(row_id) for row_id in ids}
+
+
+# Un catálogo por tenant, guardado en la caché del tenant (ver db.tenant_cache)
+# para que se libere con él.
+_CACHE_KEY = "catalog"
+_LOCK_KEY = "catalog_lock"
+catalog_stats: Dict[str, int] = {"full_loads": 0, "delta_loads": 0}
+
+
+def get_catalog(session: Optional[Session] = None) -> Catalog:
+    if session is None:
+        with get_read_session() as own_session:
+            return get_catalog(own_session)
+
+    version = get_catalog_version(session)
+    cache = tenant_cache()
+    catalog = cache.get(_CACHE_KEY)
+    if catalog is not None and catalog.version == version:
+        return catalog
+    with cache.setdefault(_LOCK_KEY, threading.Lock()):
+        catalog = cache.get(_CACHE_KEY)
+        if catalog is None or catalog.version != version:
+            patched = load_catalog_delta(session, catalog, version) if catalog else None
+            if patched is not None:
+                catalog_stats["delta_loads"] += 1
+                catalog = patched
+            else:
+                catalog_stats["full_loads"] += 1
+                catalog = load_catalog(session)
+            cache[_CACHE_KEY] = catalog
+        return catalog
+
+
+def invalidate_catalog() -> None:
+    tenant_cache().pop(_CACHE_KEY, None)
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from .catalog import Catalog, get_catalog
+from .db import engine, get_engine, init_db, tenant_exists
+from .query_log import QUERY_LOG_ENV, top_requests
+from .routers.search import SearchRequest, normalize_search
+from .search import build_results
+from .seed import provision_tenant
+from .tenants import DEFAULT_TENANT, use_tenant, validate_tenant
+
+# (número de línea, fila CSV ya leída o línea JSONL sin parsear)
+Profile = Tuple[int, Union[Dict[str, Any], str]]
+
+CSV_LIST_FIELDS = ("objectives", "pathologies")
+CSV_LIST_SEPARATOR = ";"
+DEFAULT_CHUNK_SIZE = 200
+
+# Catálogo cargado una sola vez por proceso worker (ver _init_worker).
+_worker_catalog: Optional[Catalog] = None
+
+
+def read_profiles(path: Path) -> Iterator[Profile]:
+    with path.open(encoding="utf-8", newline="") as handle:
+        if path.suffix.lower() == ".csv":
+            # La línea 1 es la cabecera.
+            for line, row in enumerate(csv.DictReader(handle), start=2):
+                yield line, _csv_row_to_profile(row)
+            return
+        for line, text in enumerate(handle, start=1):
+            if text.strip():
+                yield line, text
+
+
+def _csv_row_to_profile(row: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    profile: Dict[str, Any] = {}
+    for key, value in row.items():
+        if key is None or value is None or not value.strip():
+            continue
+        key = key.strip()
+        if key in CSV_LIST_FIELDS:
+            profile[key] = [part.strip() for part in value.split(CSV_LIST_SEPARATOR) if part.strip()]
+        else:
+            profile[key] = value.strip()
+    return profile
+
+
+def plan_profile(line: int, raw: Union[Dict[str, Any], str], catalog: Catalog) -> Dict[str, Any]:
+    record: Dict[str, Any] = {"line": line}
+    try:
+        row = json.loads(raw) if isinstance(raw, str) else raw
+        if not isinstance(row, dict):
+            raise ValueError("Se esperaba un objeto JSON por línea.")
+        if "id" in row:
+            record["id"] = row["id"]
+        params = normalize_search(SearchRequest.model_validate(row))
+    except ValidationError as exc:
+        record.update(ok=False, error=_format_validation_error(exc))
+        return record
+    except HTTPException as exc:
+        record.update(ok=False, error=str(exc.detail))
+        return record
+    except ValueError as exc:
+        record.update(ok=False, error=str(exc))
+        return record
+
+    data = build_results(**params, catalog=catalog)
+    record.update(ok=True, request=params, results=data["results"])
+    return record
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+def _init_worker(tenant: str = DEFAULT_TENANT) -> None:
+    global _worker_catalog
+    # Las conexiones heredadas del proceso padre no deben reutilizarse.
+    engine.dispose(close=False)
+    with use_tenant(tenant):
+        get_engine().dispose(close=False)
+        _worker_catalog = get_catalog()
+
+
+def _plan_chunk(chunk: List[Profile], tenant: str = DEFAULT_TENANT) -> List[Dict[str, Any]]:
+    with use_tenant(tenant):
+        catalog = _worker_catalog if _worker_catalog is not None else get_catalog()
+        return [plan_profile(line, raw, catalog) for line, raw in chunk]
+
+
+def _chunked(profiles: Iterable[Profile], size: int) -> Iterator[List[Profile]]:
+    chunk: List[Profile] = []
+    for profile in profiles:
+        chunk.append(profile)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_plan(
+    input_path: Path,
+    output: TextIO,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    tenant: str = DEFAULT_TENANT,
+) -> Dict[str, int]:
+    stats = {"profiles": 0, "ok": 0, "errors": 0}
+
+    def write(records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            stats["profiles"] += 1
+            stats["ok" if record["ok"] else "errors"] += 1
+
+    chunks = _chunked(read_profiles(input_path), max(1, chunk_size))
+    if workers <= 1:
+        for chunk in chunks:
+            write(_plan_chunk(chunk, tenant))
+        return stats
+
+    # Ventana acotada de trabajos en vuelo: la entrada se lee en streaming y
+    # la salida conserva el orden del fichero original.
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(tenant,)
+    ) as pool:
+        pending: Deque[Future] = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_plan_chunk, chunk, tenant))
+            if len(pending) >= workers * 2:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan = commands.add_parser("plan", help="Genera planes para perfiles en CSV/JSONL.")
+    plan.add_argument("input", type=Path, help="Fichero .csv o .jsonl con perfiles.")
+    plan.add_argument("-o", "--output", default="-", help="Fichero JSONL de salida ('-' = stdout).")
+    plan.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    plan.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    plan.add_argument("--tenant", default=DEFAULT_TENANT, help="Gimnasio cuyo catálogo se usa.")
+
+    top = commands.add_parser(
+        "top-queries", help="Búsquedas más pedidas según el registro (JSONL apto para 'plan')."
+    )
+    top.add_argument("-n", "--limit", type=int, default=20)
+    top.add_argument("--log", type=Path, default=os.getenv(QUERY_LOG_ENV), help="Fichero del registro.")
+    top.add_argument("--tenant", default=DEFAULT_TENANT)
+    top.add_argument("--days", type=float, default=None, help="Solo los últimos N días.")
+
+    provision = commands.add_parser("provision", help="Da de alta un gimnasio (tenant).")
+    provision.add_argument("tenant")
+    provision.add_argument("--empty", action="store_true", help="Sin el catálogo base.")
+
+    args = parser.parse_args(argv)
+    try:
+        tenant = validate_tenant(args.tenant)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.command == "top-queries":
+        if args.log is None:
+            parser.error(f"Indica --log o {QUERY_LOG_ENV}.")
+        since = time.time() - args.days * 86400 if args.days is not None else None
+        for rank, entry in enumerate(top_requests(args.log, args.limit, tenant, since), start=1):
+            line = {
+                "id": rank,
+                **entry["request"],
+                "count": entry["count"],
+                "avg_latency_ms": entry["avg_latency_ms"],
+                "avg_results": entry["avg_results"],
+            }
+            print(json.dumps(line, ensure_ascii=False))
+        return 0
+    if args.command == "provision":
+        provision_tenant(tenant, with_seed=not args.empty)
+        print(f"Tenant '{tenant}' listo.", file=sys.stderr)
+        return 0
+
+    if not tenant_exists(tenant):
+        parser.error(f"Unknown tenant '{tenant}'.")
+    init_db(tenant)
+    if args.output == "-":
+        stats = run_plan(args.input, sys.stdout, args.workers, args.chunk_size, tenant)
+    else:
+        with open(args.output, "w", encoding="utf-8") as output:
+            stats = run_plan(args.input, output, args.workers, args.chunk_size, tenant)
+    print(
+        f"{stats['profiles']} perfiles: {stats['ok']} ok, {stats['errors']} con errores",
+        file=sys.stderr,
+    )
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
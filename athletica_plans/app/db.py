@@ -1,17 +1,42 @@
 from __future__ import annotations
 
+import os
+import threading
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Dict, Optional, Sequence
 
-from sqlalchemy.engine import Connection
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.exc import OperationalError
 from sqlmodel import Session, SQLModel, create_engine, select
 
-from .models import Exercise, Routine, RoutineExercise
+from .memory_db import MemoryReplica, memory_serving_enabled
+from .models import CatalogState
+from .tenants import DEFAULT_TENANT, TenantRegistry, current_tenant, validate_tenant
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 DB_PATH = PROJECT_ROOT / "athletica_plans.db"
 DATABASE_URL = f"sqlite:///{DB_PATH}"
+CATALOG_STATE_ID = 1
+EXERCISE_TRIGRAM_TABLE = "exercise_trigram_fts"
+EXERCISE_FTS_TABLE = "exercise_fts"
+ROUTINE_FTS_TABLE = "routine_fts"
+LEGACY_FTS_TABLE = "routine_content_fts"
+EXERCISE_FTS_COLUMNS = ("name", "pattern", "notes")
+# 'tags' se indexa tal cual (texto JSON): las comillas y corchetes son
+# separadores para el tokenizador.
+ROUTINE_FTS_COLUMNS = ("name", "tags")
+
+# Un fichero SQLite por tenant (gimnasio) en TENANTS_DIR; el tenant por
+# defecto sigue usando DB_PATH.
+TENANTS_DIR = Path(os.getenv("ATHLETICA_TENANTS_DIR", PROJECT_ROOT / "tenants"))
+TENANT_CACHE_BYTES = int(os.getenv("ATHLETICA_TENANT_CACHE_MB", "256")) * 1024 * 1024
+TENANT_IDLE_SECONDS = float(os.getenv("ATHLETICA_TENANT_IDLE_SECONDS", "600"))
+# Caché de páginas de SQLite por conexión de tenant (KiB): con cientos de
+# tenants abiertos el valor por defecto (2 MiB) no escala.
+TENANT_PAGE_CACHE_KIB = 512
+READ_REPLICA_KEY = "read_replica"
+READ_REPLICA_LOCK_KEY = "read_replica_lock"
 
 engine = create_engine(
     DATABASE_URL,
@@ -20,10 +45,62 @@ engine = create_engine(
 )
 
 
-def init_db() -> None:
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    SQLModel.metadata.create_all(engine)
-    with engine.connect() as conn:
+def tenant_db_path(tenant: str) -> Path:
+    tenant = validate_tenant(tenant)
+    if tenant == DEFAULT_TENANT:
+        return DB_PATH
+    return TENANTS_DIR / f"{tenant}.db"
+
+
+def tenant_exists(tenant: str) -> bool:
+    return tenant == DEFAULT_TENANT or tenant_db_path(tenant).exists()
+
+
+def _create_tenant_engine(tenant: str) -> Engine:
+    if tenant == DEFAULT_TENANT:
+        return engine
+    path = tenant_db_path(tenant)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tenant_engine = create_engine(
+        f"sqlite:///{path}",
+        echo=False,
+        connect_args={"check_same_thread": False},
+        pool_size=2,
+        max_overflow=4,
+    )
+
+    @event.listens_for(tenant_engine, "connect")
+    def _limit_page_cache(dbapi_connection: Any, connection_record: Any) -> None:
+        dbapi_connection.execute(f"PRAGMA cache_size=-{TENANT_PAGE_CACHE_KIB};")
+
+    return tenant_engine
+
+
+tenant_registry = TenantRegistry(
+    engine_factory=_create_tenant_engine,
+    tenant_exists=tenant_exists,
+    max_bytes=TENANT_CACHE_BYTES,
+    idle_seconds=TENANT_IDLE_SECONDS,
+)
+
+
+def get_engine(tenant: Optional[str] = None) -> Engine:
+    return tenant_registry.engine(tenant)
+
+
+def tenant_cache(tenant: Optional[str] = None) -> Dict[str, Any]:
+    # Cachés ligadas al catálogo del tenant actual; se liberan al cerrarlo.
+    return tenant_registry.cache(tenant)
+
+
+def init_db(tenant: Optional[str] = None) -> None:
+    # Crea o migra la base del tenant indicado (o del actual): sirve también
+    # para dar de alta un tenant nuevo.
+    tenant = tenant or current_tenant()
+    tenant_db_path(tenant).parent.mkdir(parents=True, exist_ok=True)
+    db_engine = tenant_registry.slot(tenant, create=True).engine
+    SQLModel.metadata.create_all(db_engine)
+    with db_engine.connect() as conn:
         conn.exec_driver_sql("PRAGMA foreign_keys=ON;")
         # Intento de migración idempotente para añadir 'level' si no existe
         try:
@@ -33,84 +110,151 @@ def init_db() -> None:
                 conn.exec_driver_sql("ALTER TABLE routine ADD COLUMN level VARCHAR;")
         except Exception:
             pass
+        _ensure_search_fts(conn)
+        _ensure_exercise_trigram_index(conn)
         conn.exec_driver_sql(
-            """
-            CREATE VIRTUAL TABLE IF NOT EXISTS routine_content_fts
-            USING fts5(
-                routine_id UNINDEXED,
-                exercise_id UNINDEXED,
-                routine_name,
-                exercise_name,
-                notes,
-                pattern,
-                tags
-            );
-            """
+            "INSERT OR IGNORE INTO catalog_state (id, version) VALUES (?, 1);",
+            (CATALOG_STATE_ID,),
         )
+        conn.commit()
 
 
-def get_session() -> Session:
-    return Session(engine)
+def _ensure_search_fts(connection: Connection) -> None:
+    # Un índice por tabla base (external content): cada ejercicio y cada
+    # rutina se indexan una sola vez y la búsqueda cuenta enlaces uniendo por
+    # routineexercise. Sustituye al antiguo routine_content_fts, que copiaba
+    # los textos de rutina y ejercicio en cada enlace.
+    created = _ensure_external_fts(connection, EXERCISE_FTS_TABLE, "exercise", EXERCISE_FTS_COLUMNS)
+    created |= _ensure_external_fts(connection, ROUTINE_FTS_TABLE, "routine", ROUTINE_FTS_COLUMNS)
+    if created:
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {LEGACY_FTS_TABLE};")
 
 
-def _clear_fts(connection: Connection) -> None:
+def _ensure_exercise_trigram_index(connection: Connection) -> None:
+    # Índice de trigramas sobre 'exercise' para el autocompletado. SQLite <
+    # 3.34 no trae el tokenizador trigram: entonces se usa el fallback.
     try:
-        connection.exec_driver_sql("DELETE FROM routine_content_fts;")
-    except OperationalError:
-        # If the virtual table does not yet exist, create it and retry.
-        connection.exec_driver_sql(
-            """
-            CREATE VIRTUAL TABLE IF NOT EXISTS routine_content_fts
-            USING fts5(
-                routine_id UNINDEXED,
-                exercise_id UNINDEXED,
-                routine_name,
-                exercise_name,
-                notes,
-                pattern,
-                tags
-            );
-            """
+        _ensure_external_fts(
+            connection, EXERCISE_TRIGRAM_TABLE, "exercise", EXERCISE_FTS_COLUMNS, "trigram"
         )
-        connection.exec_driver_sql("DELETE FROM routine_content_fts;")
+    except OperationalError:
+        return
 
 
-def rebuild_fts(session: Session) -> None:
-    connection = session.connection()
-    _clear_fts(connection)
+def _ensure_external_fts(
+    connection: Connection,
+    table: str,
+    content: str,
+    columns: Sequence[str],
+    tokenize: Optional[str] = None,
+) -> bool:
+    # Tabla FTS5 external content sobre 'content' más los triggers que la
+    # mantienen sincronizada fila a fila, en la misma transacción que la
+    # escritura. Devuelve True si la ha creado (e indexado) ahora.
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE name = ?;", (table,)
+    ).first()
+    if exists:
+        return False
+    options = [*columns, f"content='{content}'", "content_rowid='id'"]
+    if tokenize:
+        options.append(f"tokenize='{tokenize}'")
+    connection.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE {table} USING fts5({', '.join(options)});"
+    )
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    connection.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {content} BEGIN
+            INSERT INTO {table} (rowid, {names}) VALUES (new.id, {new_values});
+        END;
+        """
+    )
+    connection.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {content} BEGIN
+            INSERT INTO {table} ({table}, rowid, {names}) VALUES ('delete', old.id, {old_values});
+        END;
+        """
+    )
+    connection.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE ON {content} BEGIN
+            INSERT INTO {table} ({table}, rowid, {names}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {table} (rowid, {names}) VALUES (new.id, {new_values});
+        END;
+        """
+    )
+    connection.exec_driver_sql(f"INSERT INTO {table} ({table}) VALUES ('rebuild');")
+    return True
+
+
+def get_session(tenant: Optional[str] = None) -> Session:
+    return Session(get_engine(tenant))
+
+
+def get_read_engine(tenant: Optional[str] = None) -> Engine:
+    # Lecturas de búsqueda: en modo memoria, la copia en memoria del tenant
+    # (se crea al primer uso y se libera junto con el tenant); si no, disco.
+    if not memory_serving_enabled():
+        return get_engine(tenant)
+    cache = tenant_cache(tenant)
+    replica = cache.get(READ_REPLICA_KEY)
+    if replica is None:
+        with cache.setdefault(READ_REPLICA_LOCK_KEY, threading.Lock()):
+            replica = cache.get(READ_REPLICA_KEY)
+            if replica is None:
+                replica = MemoryReplica(tenant_db_path(tenant or current_tenant()))
+                cache[READ_REPLICA_KEY] = replica
+    return replica.engine()
+
+
+def refresh_read_replica(tenant: Optional[str] = None) -> None:
+    # Tras una escritura en este proceso: su copia en memoria se pone al día
+    # sin esperar a la recarga periódica.
+    if not memory_serving_enabled():
+        return
+    replica = tenant_cache(tenant).get(READ_REPLICA_KEY)
+    if replica is not None:
+        replica.reload_if_changed()
+
 
-    routine_stmt = (
-        select(RoutineExercise, Routine, Exercise)
-        .join(Routine, RoutineExercise.routine_id == Routine.id)
-        .join(Exercise, RoutineExercise.exercise_id == Exercise.id)
-        .order_by(RoutineExercise.routine_id, RoutineExercise.order_index)
+def get_read_session(tenant: Optional[str] = None) -> Session:
+    return Session(get_read_engine(tenant))
+
+
+def get_catalog_version(session: Optional[Session] = None) -> int:
+    if session is None:
+        with get_read_session() as own_session:
+            return get_catalog_version(own_session)
+    version = session.exec(
+        select(CatalogState.version).where(CatalogState.id == CATALOG_STATE_ID)
+    ).first()
+    return int(version or 0)
+
+
+def bump_catalog_version(session: Session) -> int:
+    # Se ejecuta en la transacción del llamador: el cambio de versión se
+    # confirma (o descarta) junto con la escritura del catálogo.
+    session.connection().exec_driver_sql(
+        """
+        INSERT INTO catalog_state (id, version) VALUES (?, 1)
+        ON CONFLICT(id) DO UPDATE SET version = version + 1;
+        """,
+        (CATALOG_STATE_ID,),
     )
-    rows: Iterable[
-        tuple[RoutineExercise, Routine, Exercise]
-    ] = session.exec(routine_stmt)
-
-    for link, routine, exercise in rows:
-        tags_text = " ".join(routine.tags or [])
-        notes = exercise.notes or ""
-        connection.exec_driver_sql(
-            """
-            INSERT INTO routine_content_fts (
-                routine_id,
-                exercise_id,
-                routine_name,
-                exercise_name,
-                notes,
-                pattern,
-                tags
-            ) VALUES (?, ?, ?, ?, ?, ?, ?);
-            """,
-            (
-                routine.id,
-                exercise.id,
-                routine.name,
-                exercise.name,
-                notes,
-                exercise.pattern,
-                tags_text,
-            ),
-        )
+    return get_catalog_version(session)
+
+
+def rebuild_fts(session: Session) -> None:
+    # Los triggers ya mantienen los índices; esto los regenera desde las
+    # tablas base (p.ej. tras cargas masivas o para reparar).
+    connection = session.connection()
+    for table in (EXERCISE_FTS_TABLE, ROUTINE_FTS_TABLE, EXERCISE_TRIGRAM_TABLE):
+        try:
+            connection.exec_driver_sql(f"INSERT INTO {table} ({table}) VALUES ('rebuild');")
+        except OperationalError:
+            # Índice no disponible (p.ej. trigram en SQLite antiguo).
+            continue
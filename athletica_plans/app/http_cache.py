@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Optional
+
+# Las respuestas se pueden almacenar, pero siempre se revalidan con ETag.
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+def make_etag(*parts: object) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil (RFC 9110): W/"x" y "x" se consideran iguales.
+    candidates = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
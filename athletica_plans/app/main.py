@@ -4,32 +4,76 @@ from pathlib import Path
 from typing import Any
 
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, Response
 from fastapi.templating import Jinja2Templates
 
-from .db import init_db
+from .assets import (
+    STATIC_DIR,
+    CachedStaticFiles,
+    accepted_encodings,
+    load_manifest,
+    static_url_for,
+)
+from .db import get_catalog_version, init_db, tenant_exists, tenant_registry
+from .http_cache import REVALIDATE_CACHE_CONTROL, etag_matches
+from .pages import POPULAR_REQUESTS, IndexPage
+from .query_log import close_query_log
 from .seed import seed
-from .routers import health, search
+from .tenants import TenantMiddleware
+from .warmup import start_warmup
+from .routers import admin, exercises, health, program, search
 
 app = FastAPI(title="Athletica Plans")
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+templates.env.globals["static_url"] = static_url_for(load_manifest(STATIC_DIR))
+index_page = IndexPage(templates, popular_requests=POPULAR_REQUESTS)
+
+# Comprime respuestas JSON grandes (p.ej. búsquedas multi-objetivo); los
+# estáticos precomprimidos ya llevan Content-Encoding y no se recomprimen.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+# Tenant (gimnasio) por cabecera X-Athletica-Tenant o prefijo /t/<tenant>/.
+app.add_middleware(TenantMiddleware, tenant_exists=tenant_exists, registry=tenant_registry)
 
 app.include_router(health.router, prefix="/api", tags=["system"])
 app.include_router(search.router, prefix="/api", tags=["search"])
+app.include_router(program.router, prefix="/api", tags=["program"])
+app.include_router(exercises.router, prefix="/api", tags=["exercises"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
-app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
+app.mount("/static", CachedStaticFiles(directory=str(STATIC_DIR)), name="static")
 
 
 @app.on_event("startup")
 def on_startup() -> None:
     init_db()
     seed()
+    start_warmup([("index_page", lambda: index_page.get(get_catalog_version()))])
+
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    close_query_log()
 
 
 @app.get("/", response_class=HTMLResponse)
 def read_index(request: Request) -> Any:
-    return templates.TemplateResponse("index.html", {"request": request})
+    # La portada no depende de la petición: se sirve ya renderizada y se
+    # vuelve a renderizar solo cuando cambia la versión del catálogo.
+    page = index_page.get(get_catalog_version())
+    use_gzip = "gzip" in accepted_encodings(request.headers.get("accept-encoding"))
+    etag = page.gzip_etag if use_gzip else page.etag
+    headers = {
+        "ETag": etag,
+        "Cache-Control": REVALIDATE_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return HTMLResponse(page.gzip_body, headers=headers)
+    return HTMLResponse(page.body, headers=headers)
 
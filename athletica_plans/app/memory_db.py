@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+# Modo de servicio para nodos de solo lectura: ATHLETICA_SERVING_MODE=memory
+# copia la base en disco a una SQLite en memoria (API de backup de sqlite3,
+# FTS incluido) y todas las lecturas de búsqueda van contra esa copia. Las
+# escrituras siguen usando el engine en disco.
+SERVING_MODE_ENV = "ATHLETICA_SERVING_MODE"
+RELOAD_SECONDS_ENV = "ATHLETICA_MEMORY_RELOAD_SECONDS"
+DEFAULT_RELOAD_SECONDS = 5.0
+
+_names = itertools.count(1)
+
+
+def memory_serving_enabled() -> bool:
+    return os.getenv(SERVING_MODE_ENV, "disk").strip().lower() == "memory"
+
+
+def reload_interval() -> float:
+    return float(os.getenv(RELOAD_SECONDS_ENV, DEFAULT_RELOAD_SECONDS))
+
+
+class MemoryReplica:
+    # Copia en memoria (cache=shared) de un fichero SQLite. Cada recarga crea
+    # una base en memoria nueva y cambia el engine de golpe: las lecturas en
+    # curso terminan sobre la copia anterior y nunca ven una a medio copiar.
+    # La copia anterior se cierra en la recarga siguiente (o en close()): una
+    # petición que ya tenía su engine no abre una base en memoria vacía.
+    def __init__(self, source_path: Path, reload_seconds: Optional[float] = None) -> None:
+        self.source_path = Path(source_path)
+        self.reload_seconds = reload_interval() if reload_seconds is None else reload_seconds
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._last_check = time.monotonic()
+        self._engine, self._keeper, self.version, self.size_bytes = self._load()
+        self._retired: Optional[Tuple[Engine, sqlite3.Connection]] = None
+        self.loaded_at = time.time()
+
+    def engine(self) -> Engine:
+        self._maybe_reload()
+        return self._engine
+
+    def reload(self) -> None:
+        engine, keeper, version, size_bytes = self._load()
+        with self._lock:
+            retired, self._retired = self._retired, (self._engine, self._keeper)
+            self._engine, self._keeper = engine, keeper
+            self.version, self.size_bytes = version, size_bytes
+            self.loaded_at = time.time()
+            self.reloads += 1
+        if retired is not None:
+            _close(*retired)
+
+    def reload_if_changed(self) -> bool:
+        if _read_version(self.source_path) == self.version:
+            return False
+        self.reload()
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            retired, self._retired = self._retired, None
+        if retired is not None:
+            _close(*retired)
+        _close(self._engine, self._keeper)
+
+    def estimated_bytes(self) -> int:
+        return self.size_bytes
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "source": str(self.source_path),
+            "version": self.version,
+            "size_bytes": self.size_bytes,
+            "reloads": self.reloads,
+            "loaded_at": self.loaded_at,
+        }
+
+    def _maybe_reload(self) -> None:
+        # Comprobación barata y acotada en el tiempo; la copia se hace en un
+        # hilo aparte para no penalizar la petición que la dispara.
+        now = time.monotonic()
+        if now - self._last_check < self.reload_seconds:
+            return
+        with self._lock:
+            if self._reloading or now - self._last_check < self.reload_seconds:
+                return
+            self._reloading = True
+            self._last_check = now
+        threading.Thread(target=self._background_reload, name="athletica-replica", daemon=True).start()
+
+    def _background_reload(self) -> None:
+        try:
+            self.reload_if_changed()
+        finally:
+            with self._lock:
+                self._reloading = False
+                self._last_check = time.monotonic()
+
+    def _load(self) -> Tuple[Engine, sqlite3.Connection, Optional[int], int]:
+        uri = f"file:athletica-replica-{os.getpid()}-{next(_names)}?mode=memory&cache=shared"
+        # La conexión 'keeper' mantiene viva la base en memoria mientras esta
+        # copia esté en servicio.
+        keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        source = sqlite3.connect(f"file:{self.source_path}?mode=ro", uri=True)
+        try:
+            source.backup(keeper)
+        finally:
+            source.close()
+        page_count = keeper.execute("PRAGMA page_count;").fetchone()[0]
+        page_size = keeper.execute("PRAGMA page_size;").fetchone()[0]
+
+        engine = create_engine(
+            "sqlite://",
+            creator=lambda: sqlite3.connect(uri, uri=True, check_same_thread=False),
+            poolclass=QueuePool,
+            pool_size=5,
+            max_overflow=10,
+        )
+
+        @event.listens_for(engine, "connect")
+        def _read_only(dbapi_connection: Any, connection_record: Any) -> None:
+            dbapi_connection.execute("PRAGMA query_only=ON;")
+
+        return engine, keeper, _version_of(keeper), page_count * page_size
+
+
+def _close(engine: Engine, keeper: sqlite3.Connection) -> None:
+    engine.dispose()
+    keeper.close()
+
+
+def _read_version(path: Path) -> Optional[int]:
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return _version_of(connection)
+    finally:
+        connection.close()
+
+
+def _version_of(connection: sqlite3.Connection) -> Optional[int]:
+    try:
+        row = connection.execute("SELECT MAX(version) FROM catalog_state;").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
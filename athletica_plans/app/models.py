@@ -48,3 +48,22 @@ class RoutineExercise(SQLModel, table=True):
     exercise_id: int = Field(foreign_key="exercise.id", index=True)
     section: str = Field(index=True)
     order_index: int = Field(index=True)
+
+
+class CatalogState(SQLModel, table=True):
+    __tablename__ = "catalog_state"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # Se incrementa en cada cambio del catálogo; base de ETags y cachés.
+    version: int = Field(default=1)
+
+
+class CatalogChange(SQLModel, table=True):
+    __tablename__ = "catalog_change"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # Versión del catálogo que introdujo el cambio; permite a otros procesos
+    # aplicar solo el delta en lugar de recargar todo el catálogo.
+    version: int = Field(index=True)
+    entity: str  # exercise, routine o link
+    entity_id: int
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+from fastapi.templating import Jinja2Templates
+
+from .db import tenant_cache
+from .http_cache import make_etag
+from .routers.search import (
+    ALLOWED_LEVELS,
+    ALLOWED_OBJECTIVES,
+    ALLOWED_PATHOLOGIES,
+    SearchRequest,
+)
+from .search import build_results, search_key
+
+# Búsquedas embebidas en la portada para pintar planes sin otra petición.
+POPULAR_REQUESTS: List[Dict[str, Any]] = [
+    {
+        "objectives": ["fuerza"],
+        "session_minutes": 45,
+        "pathologies": [],
+        "level": "medio",
+        "q": None,
+    },
+]
+
+
+@dataclass(frozen=True)
+class RenderedPage:
+    version: int
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    gzip_etag: str
+
+    def estimated_bytes(self) -> int:
+        return len(self.body) + len(self.gzip_body)
+
+
+class IndexPage:
+    def __init__(
+        self,
+        templates: Jinja2Templates,
+        template_name: str = "index.html",
+        popular_requests: Sequence[Dict[str, Any]] = (),
+    ) -> None:
+        self.templates = templates
+        self.template_name = template_name
+        self.popular_requests = list(popular_requests)
+        self.cache_key = f"page:{template_name}"
+        self._lock = threading.Lock()
+
+    def get(self, catalog_version: int) -> RenderedPage:
+        # Una página por tenant, en su caché: se libera al cerrar el tenant.
+        cache = tenant_cache()
+        page = cache.get(self.cache_key)
+        if page is not None and page.version == catalog_version:
+            return page
+        with self._lock:
+            page = cache.get(self.cache_key)
+            if page is None or page.version != catalog_version:
+                page = self._render(catalog_version)
+                cache[self.cache_key] = page
+            return page
+
+    def _render(self, catalog_version: int) -> RenderedPage:
+        template = self.templates.get_template(self.template_name)
+        html = template.render(
+            objectives=ALLOWED_OBJECTIVES,
+            levels=ALLOWED_LEVELS,
+            pathologies=ALLOWED_PATHOLOGIES,
+            default_level=SearchRequest.model_fields["level"].default,
+            initial_data={"popular": self._popular_plans()},
+        )
+        body = html.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        etag = make_etag(catalog_version, digest)
+        return RenderedPage(
+            version=catalog_version,
+            body=body,
+            gzip_body=gzip.compress(body, compresslevel=9, mtime=0),
+            etag=etag,
+            gzip_etag=f'{etag[:-1]}-gzip"',
+        )
+
+    def _popular_plans(self) -> List[Dict[str, Any]]:
+        plans: List[Dict[str, Any]] = []
+        for params in self.popular_requests:
+            data = build_results(**params)
+            plans.append(
+                {
+                    "key": search_key(**params),
+                    "request": params,
+                    "results": data.get("results", []),
+                }
+            )
+        return plans
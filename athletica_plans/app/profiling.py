@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .auth import is_admin_token
+from .db import get_engine
+
+T = TypeVar("T")
+
+# Perfilado opt-in: para todas las búsquedas con ATHLETICA_PROFILE=1, o por
+# petición con la cabecera X-Athletica-Profile igual a ATHLETICA_ADMIN_TOKEN.
+PROFILE_ENV = "ATHLETICA_PROFILE"
+PROFILE_DIR_ENV = "ATHLETICA_PROFILE_DIR"
+PROFILE_HEADER = "x-athletica-profile"
+TOP_FUNCTIONS = 25
+
+AUDITED_TABLES = ("routine", "routineexercise")
+# SQLite >= 3.36 muestra el alias ('SCAN re'); un recorrido completo de un
+# índice ('USING [COVERING] INDEX') también lee todas las filas. Las tablas
+# virtuales (FTS) y las subconsultas no cuentan.
+_FULL_SCAN_RE = re.compile(
+    r"^SCAN (?:TABLE )?(?P<table>\w+)(?: AS (?P<alias>\w+))?"
+    r"(?: USING (?:COVERING )?INDEX \w+)?$",
+    re.IGNORECASE,
+)
+_TABLE_ALIAS_RE = re.compile(
+    r"\b(?:FROM|JOIN)\s+(?P<table>\w+)(?:\s+(?:AS\s+)?(?P<alias>\w+))?", re.IGNORECASE
+)
+_NOT_ALIASES = {
+    "where", "on", "using", "join", "inner", "left", "right", "full", "cross",
+    "natural", "group", "order", "limit", "union", "intersect", "except", "as",
+}
+_TEMP_ORDER_BY_RE = re.compile(r"USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY", re.IGNORECASE)
+
+_profile_lock = threading.Lock()
+
+
+class QueryPlanRegression(AssertionError):
+    pass
+
+
+class QueryAudit:
+    def __init__(self) -> None:
+        self.statements: List[Dict[str, Any]] = []
+
+    @property
+    def issues(self) -> List[Dict[str, Any]]:
+        return [
+            {"sql": entry["sql"], "issue": issue}
+            for entry in self.statements
+            for issue in entry.get("issues", [])
+        ]
+
+    def record(self, statement: str, parameters: Any) -> None:
+        self.statements.append({"sql": " ".join(statement.split()), "parameters": parameters})
+
+    def explain(self, bind: Optional[Engine] = None) -> None:
+        raw = (bind or get_engine()).raw_connection()
+        try:
+            cursor = raw.cursor()
+            for entry in self.statements:
+                if not entry["sql"].upper().startswith(("SELECT", "WITH")):
+                    continue
+                try:
+                    cursor.execute(f"EXPLAIN QUERY PLAN {entry['sql']}", entry["parameters"] or ())
+                except Exception as exc:  # pragma: no cover - depende del SQL
+                    entry["plan_error"] = str(exc)
+                    continue
+                plan = [str(row[3]) for row in cursor.fetchall()]
+                entry["plan"] = plan
+                entry["issues"] = _plan_issues(plan, _table_aliases(entry["sql"]))
+        finally:
+            raw.close()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "statements": [
+                {key: value for key, value in entry.items() if key != "parameters"}
+                for entry in self.statements
+            ],
+            "issues": self.issues,
+        }
+
+
+def _table_aliases(sql: str) -> Dict[str, str]:
+    aliases: Dict[str, str] = {}
+    for match in _TABLE_ALIAS_RE.finditer(sql):
+        table = match.group("table").lower()
+        aliases.setdefault(table, table)
+        alias = (match.group("alias") or "").lower()
+        if alias and alias not in _NOT_ALIASES:
+            aliases[alias] = table
+    return aliases
+
+
+def _plan_issues(plan: List[str], aliases: Optional[Dict[str, str]] = None) -> List[str]:
+    issues: List[str] = []
+    aliases = aliases or {}
+    for detail in plan:
+        scan = _FULL_SCAN_RE.match(detail.strip())
+        if scan:
+            name = (scan.group("alias") or scan.group("table")).lower()
+            table = aliases.get(name, scan.group("table").lower())
+            if table in AUDITED_TABLES:
+                issues.append(f"full table scan on {table}")
+        if _TEMP_ORDER_BY_RE.search(detail):
+            issues.append("ORDER BY without index (temp b-tree)")
+    return issues
+
+
+_active_audit: ContextVar[Optional[QueryAudit]] = ContextVar("active_audit", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _capture_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    audit = _active_audit.get()
+    if audit is not None and not executemany:
+        audit.record(statement, parameters)
+
+
+@contextmanager
+def audit_queries(strict: bool = False) -> Iterator[QueryAudit]:
+    audit = QueryAudit()
+    token = _active_audit.set(audit)
+    try:
+        yield audit
+    finally:
+        _active_audit.reset(token)
+    audit.explain()
+    if strict and audit.issues:
+        raise QueryPlanRegression(
+            "; ".join(f"{item['issue']}: {item['sql']}" for item in audit.issues)
+        )
+
+
+def profiling_requested(headers: Any) -> bool:
+    if os.getenv(PROFILE_ENV, "").strip().lower() in {"1", "true", "yes"}:
+        return True
+    return headers is not None and is_admin_token(headers.get(PROFILE_HEADER))
+
+
+def profile_call(
+    func: Callable[..., T], *args: Any, **kwargs: Any
+) -> Tuple[T, Optional[Dict[str, Any]]]:
+    # Solo un cProfile activo a la vez (en 3.12+ un segundo enable() lanza
+    # ValueError): si ya hay otro perfilado en curso, se responde sin perfil.
+    if not _profile_lock.acquire(blocking=False):
+        return func(*args, **kwargs), None
+    try:
+        return _profile_locked(func, *args, **kwargs)
+    finally:
+        _profile_lock.release()
+
+
+def _profile_locked(func: Callable[..., T], *args: Any, **kwargs: Any) -> Tuple[T, Dict[str, Any]]:
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    with audit_queries() as audit:
+        profiler.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profiler.disable()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    report: Dict[str, Any] = {
+        "elapsed_ms": round(elapsed_ms, 3),
+        "functions": _top_functions(stats),
+        "sql": audit.to_dict(),
+    }
+    profile_dir = os.getenv(PROFILE_DIR_ENV)
+    if profile_dir:
+        path = Path(profile_dir) / f"{getattr(func, '__name__', 'call')}-{time.time_ns()}.prof"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stats.dump_stats(str(path))
+        report["stats_file"] = str(path)
+    return result, report
+
+
+def _top_functions(stats: pstats.Stats) -> List[Dict[str, Any]]:
+    rows = []
+    for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():  # type: ignore[attr-defined]
+        rows.append(
+            {
+                "function": f"{Path(filename).name}:{line}({name})",
+                "calls": calls,
+                "total_ms": round(total * 1000, 3),
+                "cumulative_ms": round(cumulative * 1000, 3),
+            }
+        )
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:TOP_FUNCTIONS]
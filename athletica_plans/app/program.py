@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+
+from .catalog import Catalog, get_catalog
+from .models import Exercise, Routine
+from .search import (
+    build_sections_for_routine,
+    estimate_minutes,
+    exercise_to_payload,
+    is_exercise_excluded,
+    load_candidate_routines,
+    minute_difference,
+    scale_sets_by_level,
+)
+
+
+def build_program(
+    days_per_week: int,
+    objectives: List[str],
+    session_minutes: Optional[int] = None,
+    pathologies: Optional[List[str]] = None,
+    level: str = "medio",
+    catalog: Optional[Catalog] = None,
+) -> Dict[str, Any]:
+    if catalog is None:
+        catalog = get_catalog()
+    pathologies_set = {p.lower() for p in (pathologies or [])}
+    unique_objectives = list(dict.fromkeys(obj for obj in objectives if obj))
+
+    # Rutinas base (ordenadas por cercanía a los minutos pedidos) y bolsa de
+    # ejercicios principales seguros para cada objetivo.
+    bases: Dict[str, List[Routine]] = {}
+    pools: Dict[str, List[Exercise]] = {}
+    for objective in unique_objectives:
+        routines = sorted(
+            load_candidate_routines(catalog, [objective], session_minutes),
+            key=lambda routine: (
+                minute_difference(session_minutes, routine.session_minutes),
+                routine.name,
+            ),
+        )
+        bases[objective] = routines
+        pools[objective] = _main_pool(catalog, routines, pathologies_set)
+
+    pattern_counts: Counter[str] = Counter()
+    exercise_counts: Counter[int] = Counter()
+    previous_day: Set[int] = set()
+    days: List[Dict[str, Any]] = []
+
+    for day_index in range(days_per_week):
+        objective = unique_objectives[day_index % len(unique_objectives)]
+        routines = bases[objective]
+        if not routines:
+            continue
+        # Rotar la rutina base entre los días que comparten objetivo.
+        base = routines[(day_index // len(unique_objectives)) % len(routines)]
+        sections = build_sections_for_routine(catalog, base, pathologies_set, level)
+        slots = max(1, len(sections["main"]["items"]))
+
+        main_items = _pick_main_items(
+            pools[objective], slots, pattern_counts, exercise_counts, previous_day, level
+        )
+        previous_day = {item["exercise_id"] for item in main_items}
+        sections["main"] = {
+            "minutes": estimate_minutes("main", main_items),
+            "items": main_items,
+        }
+        days.append(
+            {
+                # Numeración seguida aunque algún objetivo no tenga rutinas.
+                "day": len(days) + 1,
+                "routine_id": base.id,
+                "name": base.name,
+                "objective": objective,
+                "level": level,
+                "minutes_target": session_minutes or base.session_minutes,
+                "sections": sections,
+            }
+        )
+
+    return {
+        "ok": True,
+        "days_per_week": days_per_week,
+        "days": days,
+        "pattern_counts": dict(sorted(pattern_counts.items())),
+    }
+
+
+def _main_pool(
+    catalog: Catalog,
+    routines: List[Routine],
+    pathologies: Set[str],
+) -> List[Exercise]:
+    pool: Dict[int, Exercise] = {}
+    for routine in routines:
+        for link, exercise in catalog.links_for(routine.id):
+            if link.section != "main" or exercise.id in pool:
+                continue
+            if is_exercise_excluded(exercise, pathologies):
+                continue
+            pool[exercise.id] = exercise
+    return list(pool.values())
+
+
+def _pick_main_items(
+    pool: List[Exercise],
+    slots: int,
+    pattern_counts: Counter[str],
+    exercise_counts: Counter[int],
+    previous_day: Set[int],
+    level: str,
+) -> List[Dict[str, Any]]:
+    # Heurística voraz: en cada hueco se elige el ejercicio menos repetido en
+    # la semana (y no usado el día anterior), priorizando patrones no usados
+    # hoy y poco usados en la semana. El orden de la bolsa desempata.
+    chosen: List[Dict[str, Any]] = []
+    used_today: Set[int] = set()
+    patterns_today: Counter[str] = Counter()
+    for _ in range(min(slots, len(pool))):
+        best: Optional[Exercise] = None
+        best_key: Optional[tuple] = None
+        for position, exercise in enumerate(pool):
+            if exercise.id in used_today:
+                continue
+            key = (
+                exercise_counts[exercise.id],
+                exercise.id in previous_day,
+                patterns_today[exercise.pattern],
+                pattern_counts[exercise.pattern],
+                position,
+            )
+            if best_key is None or key < best_key:
+                best, best_key = exercise, key
+        if best is None:
+            break
+        used_today.add(best.id)
+        patterns_today[best.pattern] += 1
+        pattern_counts[best.pattern] += 1
+        exercise_counts[best.id] += 1
+
+        payload = exercise_to_payload(best)
+        payload["sets"] = scale_sets_by_level(payload.get("sets"), level)
+        chosen.append(payload)
+    return chosen
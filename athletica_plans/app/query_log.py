@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Registro opcional de búsquedas normalizadas (clave, latencia, nº de
+# resultados) en un fichero SQLite aparte. La petición solo encola: un hilo
+# escribe por lotes y, si la cola está llena, la entrada se descarta.
+QUERY_LOG_ENV = "ATHLETICA_QUERY_LOG"
+MAX_QUEUE = 10_000
+BATCH_SIZE = 500
+FLUSH_SECONDS = 1.0
+
+LogEntry = Tuple[float, str, str, float, Optional[int]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_log (
+    ts REAL NOT NULL,
+    tenant TEXT NOT NULL,
+    request_key TEXT NOT NULL,
+    latency_ms REAL NOT NULL,
+    result_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_search_log_tenant_key ON search_log (tenant, request_key);
+"""
+
+
+class QueryLog:
+    def __init__(
+        self,
+        path: Path,
+        max_queue: int = MAX_QUEUE,
+        batch_size: int = BATCH_SIZE,
+        flush_seconds: float = FLUSH_SECONDS,
+    ) -> None:
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        # Si el fichero no se puede abrir el registro queda desactivado: las
+        # entradas se descartan en lugar de llenar una cola que nadie vacía.
+        self.dead = False
+        self._queue: "queue.Queue[Optional[LogEntry]]" = queue.Queue(maxsize=max_queue)
+        self._writer: Optional[threading.Thread] = None
+        # Protege el arranque del escritor y los contadores, que se actualizan
+        # desde los hilos de las peticiones y desde el escritor.
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        tenant: str,
+        request_key: str,
+        latency_ms: float,
+        result_count: Optional[int],
+    ) -> None:
+        if self.dead:
+            self._count(dropped=1)
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((time.time(), tenant, request_key, latency_ms, result_count))
+        except queue.Full:
+            self._count(dropped=1)
+            return
+        self._count(recorded=1)
+
+    def close(self, timeout: float = 5.0) -> None:
+        # Vacía la cola y para el hilo escritor; se puede volver a usar.
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is None:
+            return
+        if self.dead:
+            # Lo que se encoló mientras el escritor moría no se escribirá.
+            self._discard_queue()
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            # Escritor atascado o muerto: no se bloquea el apagado.
+            return
+        writer.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "written": self.written,
+                "queued": self._queue.qsize(),
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "dead": self.dead,
+            }
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="athletica-query-log", daemon=True
+                )
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        connection: Optional[sqlite3.Connection] = None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path))
+            connection.execute("PRAGMA journal_mode=WAL;")
+            connection.executescript(_SCHEMA)
+        except (OSError, sqlite3.Error) as exc:
+            if connection is not None:
+                connection.close()
+            self._failed(exc)
+            self.dead = True
+            self._discard_queue()
+            return
+        try:
+            stop = False
+            while not stop:
+                batch, stop = self._next_batch()
+                if not batch:
+                    continue
+                try:
+                    with connection:
+                        connection.executemany(
+                            "INSERT INTO search_log (ts, tenant, request_key, latency_ms, result_count)"
+                            " VALUES (?, ?, ?, ?, ?);",
+                            batch,
+                        )
+                except sqlite3.Error as exc:
+                    # Disco lleno, base bloqueada...: se pierde el lote y se sigue.
+                    self._failed(exc)
+                    self._lost(len(batch))
+                    continue
+                self._count(written=len(batch))
+        finally:
+            connection.close()
+
+    def _count(self, recorded: int = 0, dropped: int = 0, written: int = 0) -> None:
+        with self._lock:
+            self.recorded += recorded
+            self.dropped += dropped
+            self.written += written
+
+    def _failed(self, exc: Exception) -> None:
+        with self._lock:
+            self.errors += 1
+            self.last_error = f"{type(exc).__name__}: {exc}"
+
+    def _discard_queue(self) -> None:
+        self._lost(len(self._drain()))
+
+    def _lost(self, count: int) -> None:
+        # Entradas aceptadas que no llegarán al fichero pasan a descartadas.
+        self._count(recorded=-count, dropped=count)
+
+    def _next_batch(self) -> Tuple[List[LogEntry], bool]:
+        batch: List[LogEntry] = []
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            try:
+                entry = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if entry is None:
+                return batch + self._drain(), True
+            batch.append(entry)
+        return batch, False
+
+    def _drain(self) -> List[LogEntry]:
+        rest: List[LogEntry] = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                return rest
+            if entry is not None:
+                rest.append(entry)
+
+
+_query_log: Optional[QueryLog] = None
+_query_log_lock = threading.Lock()
+
+
+def get_query_log() -> Optional[QueryLog]:
+    global _query_log
+    path = os.getenv(QUERY_LOG_ENV)
+    if not path:
+        return None
+    log = _query_log
+    if log is not None and log.path == Path(path):
+        return log
+    with _query_log_lock:
+        if _query_log is None or _query_log.path != Path(path):
+            if _query_log is not None:
+                _query_log.close()
+            _query_log = QueryLog(Path(path))
+        return _query_log
+
+
+def close_query_log() -> None:
+    log = _query_log
+    if log is not None:
+        log.close()
+
+
+atexit.register(close_query_log)
+
+
+def top_requests(
+    path: Path,
+    limit: int = 20,
+    tenant: Optional[str] = None,
+    since: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    # Claves de búsqueda más pedidas, con su latencia y nº de resultados
+    # medios; 'request' es la búsqueda normalizada lista para build_results.
+    if not Path(path).exists():
+        return []
+    conditions, params = [], []
+    if tenant is not None:
+        conditions.append("tenant = ?")
+        params.append(tenant)
+    if since is not None:
+        conditions.append("ts >= ?")
+        params.append(since)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute(
+            f"""
+            SELECT tenant, request_key, COUNT(*) AS hits, AVG(latency_ms), AVG(result_count)
+            FROM search_log
+            {where}
+            GROUP BY tenant, request_key
+            ORDER BY hits DESC, request_key
+            LIMIT ?;
+            """,
+            (*params, limit),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        connection.close()
+    return [
+        {
+            "tenant": row_tenant,
+            "key": key,
+            "request": json.loads(key),
+            "count": hits,
+            "avg_latency_ms": round(latency, 3),
+            "avg_results": round(results, 2) if results is not None else None,
+        }
+        for row_tenant, key, hits, latency, results in rows
+    ]
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .models import Routine
+
+try:  # NumPy es opcional: sin él se usa el ranking en Python puro.
+    import numpy as np
+except ImportError:  # pragma: no cover - depende del entorno
+    np = None
+
+# Por debajo de este tamaño el coste fijo de NumPy no compensa.
+VECTORIZE_MIN_ROUTINES = 2000
+MINUTES_WINDOW = 5
+MIXTO = "mixto"
+
+RankedRoutine = Tuple[Routine, float]
+
+
+class RoutineColumns:
+    # Vista columnar de las rutinas del catálogo: una posición por rutina,
+    # alineada con 'routines'.
+    def __init__(self, routines: Sequence[Routine]) -> None:
+        self.routines = list(routines)
+        self.objective_codes: Dict[str, int] = {}
+        codes = []
+        for routine in self.routines:
+            codes.append(self.objective_codes.setdefault(routine.objective, len(self.objective_codes)))
+        self.objective = np.asarray(codes, dtype=np.int32)
+        self.minutes = np.asarray(
+            [routine.session_minutes for routine in self.routines], dtype=np.int64
+        )
+        order = sorted(range(len(self.routines)), key=lambda pos: self.routines[pos].name)
+        self.name_rank = np.empty(len(self.routines), dtype=np.int64)
+        self.name_rank[order] = np.arange(len(self.routines), dtype=np.int64)
+        self.position_by_id: Dict[int, int] = {
+            routine.id: position for position, routine in enumerate(self.routines)
+        }
+
+    @classmethod
+    def build(cls, routines: Sequence[Routine]) -> Optional["RoutineColumns"]:
+        if np is None or len(routines) < VECTORIZE_MIN_ROUTINES:
+            return None
+        return cls(routines)
+
+    def _objective_mask(self, objectives: Sequence[str]) -> "np.ndarray":
+        codes = [self.objective_codes[obj] for obj in objectives if obj in self.objective_codes]
+        return np.isin(self.objective, np.asarray(codes, dtype=np.int32))
+
+    def rank(
+        self,
+        objectives: List[str],
+        session_minutes: Optional[int],
+        fts_scores: Dict[int, float],
+        limit: Optional[int] = None,
+    ) -> Tuple[List[RankedRoutine], bool]:
+        # Equivalente vectorizado de load_candidate_routines + ordenación:
+        # mismos candidatos, misma ventana de minutos y mismo orden
+        # (FTS desc, proximidad de minutos, nombre asc).
+        candidate_objs = [obj for obj in objectives if obj]
+        if not candidate_objs:
+            return [], False
+        include_mixto = len(set(candidate_objs)) > 1
+
+        mask = self._objective_mask(candidate_objs)
+        mixto_mask = self._objective_mask([MIXTO]) if include_mixto else None
+        if mixto_mask is not None:
+            mask |= mixto_mask
+        if session_minutes is not None:
+            lower, upper = max(0, session_minutes - MINUTES_WINDOW), session_minutes + MINUTES_WINDOW
+            window = mask & (self.minutes >= lower) & (self.minutes <= upper)
+            if window.any():
+                mask = window
+
+        positions = np.flatnonzero(mask)
+        if positions.size == 0:
+            return [], False
+
+        scores = np.zeros(positions.size, dtype=np.float64)
+        if fts_scores:
+            lookup = {position: index for index, position in enumerate(positions.tolist())}
+            for routine_id, score in fts_scores.items():
+                index = lookup.get(self.position_by_id.get(routine_id, -1))
+                if index is not None:
+                    scores[index] = score
+
+        if session_minutes is not None:
+            diff = np.abs(self.minutes[positions] - session_minutes)
+        else:
+            diff = np.zeros(positions.size, dtype=np.int64)
+
+        # Clave entera compuesta (rango de score, diferencia, rango de nombre)
+        # para poder usar argpartition en el top-k.
+        distinct = np.unique(scores)
+        score_rank = distinct.size - 1 - np.searchsorted(distinct, scores)
+        span = len(self.routines)
+        key = (score_rank * (int(diff.max()) + 1) + diff) * span + self.name_rank[positions]
+
+        if limit is not None and limit < positions.size:
+            top = np.argpartition(key, limit - 1)[:limit]
+            top = top[np.argsort(key[top], kind="stable")]
+        else:
+            top = np.argsort(key, kind="stable")
+        # Solo cuenta un 'mixto' que entra en el top-k; si no, se compone.
+        has_mixto = bool(mixto_mask is not None and mixto_mask[positions[top]].any())
+
+        return (
+            [(self.routines[positions[index]], float(scores[index])) for index in top.tolist()],
+            has_mixto,
+        )
@@ -0,0 +1,120 @@
+from typing import Any, Callable, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field, field_validator
+
+from .. import admin
+from ..auth import require_admin
+from ..catalog import catalog_stats
+from ..db import tenant_registry
+from ..query_log import get_query_log
+from ..search import search_stats
+from .search import ALLOWED_OBJECTIVES, search_flights
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+ROUTINE_OBJECTIVES = ALLOWED_OBJECTIVES + ("mixto",)
+
+
+class ExerciseIn(BaseModel):
+    name: str = Field(min_length=1, max_length=120)
+    pattern: str = Field(min_length=1, max_length=60)
+    sets: Optional[int] = Field(default=None, ge=1)
+    reps: Optional[str] = None
+    rest: Optional[str] = None
+    intensity: Optional[str] = None
+    minutes: Optional[int] = Field(default=None, ge=0)
+    notes: Optional[str] = None
+    contraindications: List[str] = Field(default_factory=list)
+
+    @field_validator("contraindications")
+    @classmethod
+    def _normalize_contraindications(cls, values: List[str]) -> List[str]:
+        return [value.strip().lower() for value in values if value.strip()]
+
+
+class RoutineIn(BaseModel):
+    name: str = Field(min_length=1, max_length=120)
+    objective: str
+    session_minutes: int = Field(ge=10, le=180)
+    level: Literal["principiante", "medio", "avanzado"] = "principiante"
+    tags: List[str] = Field(default_factory=list)
+
+    @field_validator("objective")
+    @classmethod
+    def _check_objective(cls, value: str) -> str:
+        value = value.strip().lower()
+        if value not in ROUTINE_OBJECTIVES:
+            raise ValueError(f"Unsupported objective '{value}'.")
+        return value
+
+
+class LinkIn(BaseModel):
+    exercise_id: int
+    section: Literal["warmup", "main", "cooldown"]
+    order_index: int = Field(ge=0)
+
+
+def _run(func: Callable[..., dict], *args: Any) -> dict:
+    try:
+        return func(*args)
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+
+@router.post("/exercises", status_code=201)
+def create_exercise(payload: ExerciseIn) -> dict:
+    return _run(admin.create_exercise, payload.model_dump())
+
+
+@router.put("/exercises/{exercise_id}")
+def update_exercise(exercise_id: int, payload: ExerciseIn) -> dict:
+    return _run(admin.update_exercise, exercise_id, payload.model_dump())
+
+
+@router.delete("/exercises/{exercise_id}")
+def delete_exercise(exercise_id: int) -> dict:
+    return _run(admin.delete_exercise, exercise_id)
+
+
+@router.post("/routines", status_code=201)
+def create_routine(payload: RoutineIn) -> dict:
+    return _run(admin.create_routine, payload.model_dump())
+
+
+@router.put("/routines/{routine_id}")
+def update_routine(routine_id: int, payload: RoutineIn) -> dict:
+    return _run(admin.update_routine, routine_id, payload.model_dump())
+
+
+@router.delete("/routines/{routine_id}")
+def delete_routine(routine_id: int) -> dict:
+    return _run(admin.delete_routine, routine_id)
+
+
+@router.post("/routines/{routine_id}/exercises", status_code=201)
+def create_link(routine_id: int, payload: LinkIn) -> dict:
+    return _run(admin.create_link, routine_id, payload.model_dump())
+
+
+@router.put("/links/{link_id}")
+def update_link(link_id: int, payload: LinkIn) -> dict:
+    return _run(admin.update_link, link_id, payload.model_dump())
+
+
+@router.delete("/links/{link_id}")
+def delete_link(link_id: int) -> dict:
+    return _run(admin.delete_link, link_id)
+
+
+@router.get("/stats")
+def stats() -> dict:
+    # Contadores del proceso: recargas del catálogo y deduplicación de búsquedas.
+    log = get_query_log()
+    return {
+        "catalog": dict(catalog_stats),
+        "search": dict(search_stats),
+        "search_coalescing": {**search_flights.stats(), "in_flight": search_flights.in_flight()},
+        "tenants": tenant_registry.stats(),
+        "query_log": log.stats() if log is not None else None,
+    }
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Query
+
+from ..suggest import DEFAULT_LIMIT, MAX_LIMIT, suggest_exercises
+
+router = APIRouter()
+
+
+@router.get("/exercises/suggest")
+def suggest(
+    q: str = Query(..., min_length=1, max_length=120),
+    limit: int = Query(default=DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+) -> dict:
+    return {"ok": True, "q": q, "suggestions": suggest_exercises(q, limit)}
@@ -1,4 +1,7 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from .. import warmup
 
 router = APIRouter()
 
@@ -7,3 +10,13 @@ router = APIRouter()
 def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
 
+
+@router.get("/ready")
+def readiness() -> JSONResponse:
+    # Para el balanceador: 503 mientras el proceso sigue calentando cachés y
+    # también si el calentamiento falló (p.ej. base de datos ilegible).
+    state = warmup.warmup_state
+    return JSONResponse(
+        {"status": state.status, "warmup": state.to_dict()},
+        status_code=200 if state.ready else 503,
+    )
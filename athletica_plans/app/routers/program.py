@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from pydantic import ConfigDict, Field
+
+from ..program import build_program
+from .search import ProfileRequest, normalize_profile
+
+router = APIRouter()
+
+
+class ProgramRequest(ProfileRequest):
+    # 'q', 'limit' o 'cursor' no aplican al programa: mejor 422 que ignorarlos.
+    model_config = ConfigDict(extra="forbid")
+
+    days_per_week: int = Field(default=3, ge=1, le=7)
+
+
+@router.post("/program")
+def program(payload: ProgramRequest) -> dict:
+    return build_program(days_per_week=payload.days_per_week, **normalize_profile(payload))
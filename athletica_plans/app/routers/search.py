@@ -1,31 +1,46 @@
-from typing import List, Optional, Literal
+import time
+from contextlib import contextmanager
+from typing import Annotated, Any, Dict, Iterator, List, Optional, Literal
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel, Field
 
-from ..search import build_results
+from ..db import get_catalog_version
+from ..http_cache import REVALIDATE_CACHE_CONTROL, etag_matches, make_etag
+from ..profiling import profile_call, profiling_requested
+from ..query_log import get_query_log
+from ..search import StaleCursorError, build_results, search_budget_ms, search_key
+from ..singleflight import SingleFlight
+from ..tenants import current_tenant
 
 router = APIRouter()
+search_flights = SingleFlight()
 
-ALLOWED_PATHOLOGIES = {"hombro", "lumbar", "rodilla"}
-ALLOWED_OBJECTIVES = {"fuerza", "hipertrofia", "resistencia", "movilidad", "salud"}
-ALLOWED_LEVELS = {"principiante", "medio", "avanzado"}
+# Tuplas (no sets) para conservar el orden al pintarlas en la portada.
+ALLOWED_PATHOLOGIES = ("hombro", "lumbar", "rodilla")
+ALLOWED_OBJECTIVES = ("fuerza", "hipertrofia", "resistencia", "movilidad", "salud")
+ALLOWED_LEVELS = ("principiante", "medio", "avanzado")
 
 
-class SearchRequest(BaseModel):
+class ProfileRequest(BaseModel):
     # Compatibilidad: se puede enviar 'objective' (str) o 'objectives' (list[str])
     objective: Optional[str] = Field(default=None)
     objectives: Optional[List[str]] = Field(default=None)
 
     session_minutes: Optional[int] = Field(default=None, ge=10, le=180)
     pathologies: List[str] = Field(default_factory=list)
-    q: Optional[str] = Field(default=None, max_length=120)
-
     level: Literal["principiante", "medio", "avanzado"] = "medio"
 
 
-@router.post("/search")
-def search(payload: SearchRequest) -> dict:
+class SearchRequest(ProfileRequest):
+    q: Optional[str] = Field(default=None, max_length=120)
+    limit: Optional[int] = Field(default=None, ge=1, le=200)
+    # 'next_cursor' de una respuesta parcial, para pedir el resto.
+    cursor: Optional[str] = Field(default=None, pattern=r"^\d+\.\d+(\+mixto)?$", max_length=32)
+
+
+def normalize_profile(payload: ProfileRequest) -> Dict[str, Any]:
     # Normalizar objetivos a lista (lower, sin vacíos)
     objectives: List[str] = []
     if payload.objectives and isinstance(payload.objectives, list):
@@ -52,10 +67,97 @@ def search(payload: SearchRequest) -> dict:
     if level not in ALLOWED_LEVELS:
         raise HTTPException(status_code=400, detail=f"Unsupported level '{level}'.")
 
-    return build_results(
-        objectives=objectives,
-        session_minutes=payload.session_minutes,
-        pathologies=normalized_pathologies,
-        level=level,
-        q=payload.q.strip() if payload.q else None,
+    return {
+        "objectives": objectives,
+        "session_minutes": payload.session_minutes,
+        "pathologies": normalized_pathologies,
+        "level": level,
+    }
+
+
+def normalize_search(payload: SearchRequest) -> Dict[str, Any]:
+    return {
+        **normalize_profile(payload),
+        "q": (payload.q.strip() or None) if payload.q else None,
+        "limit": payload.limit,
+        "cursor": payload.cursor,
+    }
+
+
+def coalesced_results(params: Dict[str, Any], catalog_version: Optional[int] = None) -> Dict[str, Any]:
+    # Búsquedas idénticas simultáneas (p.ej. al empezar una clase) comparten
+    # una sola ejecución de build_results. Cada esperador recibe su propia
+    # copia superficial para que añadir claves (p.ej. 'profile') no afecte al resto.
+    if catalog_version is None:
+        catalog_version = get_catalog_version()
+    key = f"{current_tenant()}:{catalog_version}:{search_key(**params)}"
+    with _stale_cursor_as_409():
+        result = search_flights.do(key, build_results, budget_ms=search_budget_ms(), **params)
+    return dict(result)
+
+
+def _run_search(request: Request, params: Dict[str, Any]) -> Dict[str, Any]:
+    if not profiling_requested(request.headers):
+        return coalesced_results(params)
+    with _stale_cursor_as_409():
+        result, report = profile_call(build_results, budget_ms=search_budget_ms(), **params)
+    if report is None:
+        return result
+    return {**result, "profile": report}
+
+
+@contextmanager
+def _stale_cursor_as_409() -> Iterator[None]:
+    # El cliente debe repetir la búsqueda desde el principio.
+    try:
+        yield
+    except StaleCursorError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+
+def _log_search(params: Dict[str, Any], started: float, data: Optional[Dict[str, Any]]) -> None:
+    # Solo encola (ver query_log): nunca bloquea la respuesta.
+    log = get_query_log()
+    if log is None:
+        return
+    results = data.get("results") if data is not None else None
+    log.record(
+        current_tenant(),
+        search_key(**params),
+        (time.perf_counter() - started) * 1000,
+        len(results) if results is not None else None,
     )
+
+
+@router.post("/search")
+def search(request: Request, payload: SearchRequest) -> dict:
+    started = time.perf_counter()
+    params = normalize_search(payload)
+    data = _run_search(request, params)
+    _log_search(params, started, data)
+    return data
+
+
+@router.get("/search")
+def search_cacheable(request: Request, payload: Annotated[SearchRequest, Query()]) -> Response:
+    # Variante GET cacheable: el ETag depende de la versión del catálogo y de
+    # la petición normalizada, así que un 304 no necesita ejecutar la búsqueda.
+    started = time.perf_counter()
+    params = normalize_search(payload)
+    catalog_version = get_catalog_version()
+    etag = make_etag(current_tenant(), catalog_version, search_key(**params))
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    if profiling_requested(request.headers):
+        # Un perfil es específico de esta ejecución: nunca se cachea.
+        data = _run_search(request, params)
+        _log_search(params, started, data)
+        return JSONResponse(data, headers={"Cache-Control": "no-store"})
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        _log_search(params, started, None)
+        return Response(status_code=304, headers=headers)
+    data = coalesced_results(params, catalog_version)
+    _log_search(params, started, data)
+    if data["partial"]:
+        # Depende de cuánto tardó esta ejecución: no se cachea.
+        return JSONResponse(data, headers={"Cache-Control": "no-store"})
+    return JSONResponse(data, headers=headers)
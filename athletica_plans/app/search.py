@@ -1,15 +1,28 @@
 from __future__ import annotations
 
+import json
+import os
+import re
+import time
 from collections import defaultdict
 from copy import deepcopy
 from math import floor
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 from sqlalchemy.exc import OperationalError
-from sqlmodel import Session, select
-
-from .db import get_session
-from .models import Exercise, Routine, RoutineExercise
+from sqlmodel import Session
+
+from .catalog import Catalog, LinkRow, get_catalog
+from .db import (
+    EXERCISE_FTS_COLUMNS,
+    EXERCISE_FTS_TABLE,
+    ROUTINE_FTS_COLUMNS,
+    ROUTINE_FTS_TABLE,
+    get_read_session,
+)
+from .models import Exercise, Routine
+from .ranking import RankedRoutine
+from .suggest import suggest_exercises
 
 SectionPayload = Dict[str, Any]
 
@@ -40,6 +53,40 @@ FALLBACK_COOLDOWN_ITEM: Dict[str, Any] = {
 }
 
 SECTION_ORDER = ("warmup", "main", "cooldown")
+# Sugerencias usadas para ampliar un 'q' sin coincidencias en el FTS.
+EXPANSION_SUGGESTIONS = 3
+# Presupuesto de tiempo por búsqueda (ms): al agotarse se devuelve lo ya
+# construido con partial=true y un cursor para pedir el resto.
+SEARCH_BUDGET_ENV = "ATHLETICA_SEARCH_BUDGET_MS"
+DEFAULT_SEARCH_BUDGET_MS = 300.0
+# Cursor: '<versión del catálogo>.<posición en la lista ordenada>', con
+# '+mixto' si falta el plan compuesto.
+CURSOR_RE = re.compile(r"^(\d+)\.(\d+)(\+mixto)?$")
+
+
+class StaleCursorError(ValueError):
+    # El catálogo cambió entre páginas: el orden ya no es el mismo y seguir
+    # saltaría o repetiría rutinas.
+    pass
+
+search_stats: Dict[str, int] = {"partial": 0}
+
+# Términos sueltos de una consulta FTS (palabra, prefijo o frase).
+_FTS_TERM_RE = re.compile(r'(?:\w+:)?(?:"[^"]*"|\w+\*?)')
+_FTS_OPERATORS = {"AND", "OR", "NOT", "NEAR"}
+_FTS_PHRASE_RE = re.compile(r'"[^"]*"')
+# Filtro de columna de FTS5: 'col:', '{col1 col2}:', '-col:', '- {col}:'.
+_COLUMN_FILTER_RE = re.compile(r"(?P<prefix>(?:^|(?<=[\s(]))-?\s*)(?P<columns>\{[^}]*\}|[A-Za-z_]\w*)\s*:")
+_FTS_TABLE_COLUMNS = {ROUTINE_FTS_TABLE: ROUTINE_FTS_COLUMNS, EXERCISE_FTS_TABLE: EXERCISE_FTS_COLUMNS}
+_FTS_LINK_COLUMN = {ROUTINE_FTS_TABLE: "routine_id", EXERCISE_FTS_TABLE: "exercise_id"}
+# Columnas del antiguo índice por enlace que siguen aceptándose en 'q'.
+_FTS_LEGACY_COLUMNS = {"routine_name": (ROUTINE_FTS_TABLE, "name"), "exercise_name": (EXERCISE_FTS_TABLE, "name")}
+
+
+def search_budget_ms() -> Optional[float]:
+    # 0 (o negativo) desactiva el presupuesto.
+    budget = float(os.getenv(SEARCH_BUDGET_ENV, DEFAULT_SEARCH_BUDGET_MS))
+    return budget if budget > 0 else None
 
 
 def build_results(
@@ -48,69 +95,167 @@ def build_results(
     pathologies: Optional[List[str]] = None,
     level: str = "medio",
     q: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    catalog: Optional[Catalog] = None,
+    budget_ms: Optional[float] = None,
 ) -> Dict[str, Any]:
+    deadline = time.perf_counter() + budget_ms / 1000 if budget_ms else None
     pathologies_set = {p.lower() for p in (pathologies or [])}
     objective_set = {obj for obj in objectives if obj}
     multi_objective = len(objective_set) > 1
-    with get_session() as session:
-        routines = _load_candidate_routines(session, objectives, session_minutes)
-        fts_scores = _load_fts_scores(session, q) if q else {}
-        results: List[Dict[str, Any]] = []
-
-        for routine in routines:
-            section_payloads = _build_sections_for_routine(
-                session=session,
-                routine=routine,
-                pathologies=pathologies_set,
-                level=level,
-            )
-            results.append(
-                {
-                    "routine_id": routine.id,
-                    "name": routine.name,
-                    "objective": routine.objective,
-                    "level": level,  # el nivel solicitado por el usuario
-                    "minutes_target": routine.session_minutes,
-                    "sections": section_payloads,
-                    "score": fts_scores.get(routine.id, 0),
-                }
-            )
-
-        # Orden: FTS desc, proximidad de minutos, nombre asc
-        results.sort(
-            key=lambda item: (
-                -item["score"],
-                _minute_difference(session_minutes, item["minutes_target"])
-                if session_minutes is not None else 0,
-                item["name"],
-            )
+    if catalog is None:
+        catalog = get_catalog()
+    offset, mixed_pending = _parse_cursor(cursor, catalog.version)
+
+    fts_scores: Dict[int, float] = {}
+    if q:
+        with get_read_session() as session:
+            fts_scores = _load_fts_scores(session, q)
+
+    # Se ordena antes de construir secciones: solo se materializan las
+    # rutinas que entran en el resultado.
+    ranked, has_mixto = _rank_candidates(
+        catalog, objectives, session_minutes, fts_scores, limit
+    )
+    if cursor is None:
+        mixed_pending = multi_objective and not has_mixto
+    results: List[Dict[str, Any]] = []
+    # Secciones ya construidas por rutina: el plan compuesto las reutiliza.
+    built: Dict[int, Dict[str, SectionPayload]] = {}
+
+    position = offset
+    for routine, _score in ranked[offset:]:
+        # Siempre se construye al menos una rutina por petición para que
+        # seguir el cursor avance.
+        if results and _expired(deadline):
+            break
+        section_payloads = build_sections_for_routine(
+            catalog=catalog,
+            routine=routine,
+            pathologies=pathologies_set,
+            level=level,
         )
+        built[routine.id] = section_payloads
+        results.append(
+            {
+                "routine_id": routine.id,
+                "name": routine.name,
+                "objective": routine.objective,
+                "level": level,  # el nivel solicitado por el usuario
+                "minutes_target": routine.session_minutes,
+                "sections": section_payloads,
+            }
+        )
+        position += 1
+
+    # Con el presupuesto agotado el plan compuesto se deja para la página
+    # siguiente (salvo que esta no haya construido nada).
+    if mixed_pending and (not results or not _expired(deadline)):
+        mixed_pending = False
+        composed = _compose_mixed_plan(
+            catalog=catalog,
+            objectives=objectives,
+            session_minutes=session_minutes,
+            pathologies=pathologies_set,
+            level=level,
+            built=built,
+        )
+        if composed:
+            results.insert(0, composed)
 
-        if multi_objective and not any(r.get("objective") == "mixto" for r in results):
-            composed = _compose_mixed_plan(
-                session=session,
-                objectives=objectives,
-                session_minutes=session_minutes,
-                pathologies=pathologies_set,
-                level=level,
-            )
-            if composed:
-                results.insert(0, composed)
+    partial = position < len(ranked) or mixed_pending
+    if partial:
+        search_stats["partial"] += 1
+    return {
+        "ok": True,
+        "results": results,
+        "partial": partial,
+        "next_cursor": _format_cursor(catalog.version, position, mixed_pending) if partial else None,
+    }
+
+
+def _expired(deadline: Optional[float]) -> bool:
+    return deadline is not None and time.perf_counter() >= deadline
+
+
+def _parse_cursor(cursor: Optional[str], version: int) -> Tuple[int, bool]:
+    if cursor is None:
+        return 0, False
+    match = CURSOR_RE.match(cursor)
+    if match is None:
+        raise ValueError(f"Invalid cursor '{cursor}'.")
+    if int(match.group(1)) != version:
+        raise StaleCursorError(f"Cursor '{cursor}' is from catalog version {match.group(1)}, now {version}.")
+    return int(match.group(2)), bool(match.group(3))
+
+
+def _format_cursor(version: int, offset: int, mixed_pending: bool) -> str:
+    cursor = f"{version}.{offset}"
+    return f"{cursor}+mixto" if mixed_pending else cursor
+
+
+def _rank_candidates(
+    catalog: Catalog,
+    objectives: List[str],
+    session_minutes: Optional[int],
+    fts_scores: Dict[int, float],
+    limit: Optional[int],
+) -> Tuple[List[RankedRoutine], bool]:
+    if catalog.columns is not None:
+        return catalog.columns.rank(objectives, session_minutes, fts_scores, limit)
+
+    routines = load_candidate_routines(catalog, objectives, session_minutes)
+    # Orden: FTS desc, proximidad de minutos, nombre asc
+    routines.sort(
+        key=lambda routine: (
+            -fts_scores.get(routine.id, 0),
+            minute_difference(session_minutes, routine.session_minutes),
+            routine.name,
+        )
+    )
+    if limit is not None:
+        routines = routines[:limit]
+    # Solo cuenta un 'mixto' que entra en el resultado; si no, se compone.
+    has_mixto = any(routine.objective == "mixto" for routine in routines)
+    return [(routine, fts_scores.get(routine.id, 0)) for routine in routines], has_mixto
 
-        for item in results:
-            item.pop("score", None)
 
-        return {"ok": True, "results": results}
+def search_key(
+    objectives: List[str],
+    session_minutes: Optional[int] = None,
+    pathologies: Optional[List[str]] = None,
+    level: str = "medio",
+    q: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> str:
+    # Clave canónica de una búsqueda ya normalizada: dos peticiones con la
+    # misma clave producen exactamente los mismos resultados.
+    unique_objectives = list(dict.fromkeys(obj for obj in objectives if obj))
+    key: Dict[str, Any] = {
+        "objectives": unique_objectives,
+        "session_minutes": session_minutes,
+        "pathologies": sorted({p.lower() for p in (pathologies or [])}),
+        "level": level,
+        "q": q or None,
+        "limit": limit,
+    }
+    # Solo las páginas siguientes llevan cursor: la clave de la primera no
+    # cambia (ETags y registro de búsquedas siguen valiendo).
+    if cursor is not None:
+        key["cursor"] = cursor
+    return json.dumps(key, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
 
 
-def _minute_difference(target: Optional[int], actual: int) -> int:
+def minute_difference(target: Optional[int], actual: int) -> int:
     if target is None:
         return 0
     return abs(actual - target)
 
 
-def _load_candidate_routines(
-    session: Session,
+def load_candidate_routines(
+    catalog: Catalog,
     objectives: List[str],
     session_minutes: Optional[int],
 ) -> List[Routine]:
@@ -121,12 +266,10 @@ def _load_candidate_routines(
     candidate_set = set(candidate_objs)
     include_mixto = len(candidate_set) > 1
 
-    base_stmt = select(Routine).where(Routine.objective.in_(candidate_set))
-    routines = session.exec(base_stmt).all()
+    routines = catalog.routines_for(candidate_objs)
 
     if include_mixto:
-        mixto_stmt = select(Routine).where(Routine.objective == "mixto")
-        routines += session.exec(mixto_stmt).all()
+        routines += catalog.routines_for(["mixto"])
 
     if session_minutes is not None:
         lower, upper = max(0, session_minutes - 5), session_minutes + 5
@@ -140,9 +283,7 @@ def _load_candidate_routines(
 
     if not routines:
         fallback_set = candidate_set | {"mixto"} if include_mixto else candidate_set
-        routines = session.exec(
-            select(Routine).where(Routine.objective.in_(fallback_set))
-        ).all()
+        routines = catalog.routines_for(list(fallback_set))
 
     dedup: Dict[int, Routine] = {}
     for routine in routines:
@@ -154,11 +295,12 @@ def _load_candidate_routines(
 
 
 def _compose_mixed_plan(
-    session: Session,
+    catalog: Catalog,
     objectives: List[str],
     session_minutes: Optional[int],
     pathologies: Iterable[str],
     level: str,
+    built: Optional[Dict[int, Dict[str, SectionPayload]]] = None,
 ) -> Optional[Dict[str, Any]]:
     unique_objectives: List[str] = []
     seen = set()
@@ -169,8 +311,7 @@ def _compose_mixed_plan(
         unique_objectives.append(obj)
 
     def best_for(obj: str) -> Optional[Routine]:
-        stmt = select(Routine).where(Routine.objective == obj).order_by(Routine.name)
-        candidates = session.exec(stmt).all()
+        candidates = sorted(catalog.routines_for([obj]), key=lambda routine: routine.name)
         if not candidates:
             return None
 
@@ -187,7 +328,7 @@ def _compose_mixed_plan(
         ordered = sorted(
             ordered,
             key=lambda routine: (
-                _minute_difference(session_minutes, routine.session_minutes)
+                minute_difference(session_minutes, routine.session_minutes)
                 if session_minutes is not None
                 else 0,
                 routine.name,
@@ -201,8 +342,9 @@ def _compose_mixed_plan(
         return None
 
     first, second = picks[0], picks[1]
-    sections_a = _build_sections_for_routine(session, first, pathologies, level)
-    sections_b = _build_sections_for_routine(session, second, pathologies, level)
+    built = built or {}
+    sections_a = built.get(first.id) or build_sections_for_routine(catalog, first, pathologies, level)
+    sections_b = built.get(second.id) or build_sections_for_routine(catalog, second, pathologies, level)
 
     warmup_section = deepcopy(sections_a.get("warmup"))
     if warmup_section is None:
@@ -232,7 +374,7 @@ def _compose_mixed_plan(
         fallback_main = sections_a.get("main") or sections_b.get("main")
         main_items = deepcopy((fallback_main or {}).get("items", []))
 
-    main_minutes = _estimate_minutes("main", main_items)
+    main_minutes = estimate_minutes("main", main_items)
 
     minutes_target: int
     if session_minutes is not None:
@@ -258,21 +400,61 @@ def _compose_mixed_plan(
         "level": level,
         "minutes_target": minutes_target,
         "sections": result_sections,
-        "score": 999.0,
     }
 
 
 def _load_fts_scores(session: Session, query: str) -> Dict[int, float]:
+    scores = _match_fts(session, query)
+    if scores:
+        return scores
+    # Sin coincidencias (entrada parcial o con erratas): se reintenta con los
+    # ejercicios sugeridos por el índice de trigramas.
+    expanded = _expand_query(session, query)
+    return _match_fts(session, expanded) if expanded else {}
+
+
+def _expand_query(session: Session, query: str) -> Optional[str]:
+    suggestions = suggest_exercises(query, limit=EXPANSION_SUGGESTIONS, session=session)
+    phrases = [
+        '"{}"'.format(item["name"].replace('"', '""'))
+        for item in suggestions
+    ]
+    return " OR ".join(phrases) or None
+
+
+def _match_fts(session: Session, query: str) -> Dict[int, float]:
+    # Puntuación = nº de enlaces (ejercicio dentro de rutina) que casan, como
+    # con el antiguo índice por enlace: un enlace casa un grupo si lo casa su
+    # rutina (nombre, tags) o su ejercicio (nombre, patrón, notas). Los
+    # candidatos salen del primer grupo (índices de routine_id y exercise_id)
+    # y el resto de grupos los filtra.
+    groups = [_fts_branches(group) for group in _fts_groups(query)]
+    if not all(groups):
+        # Algún grupo filtra por columnas que no existen: nada puede casar.
+        return {}
+    first, *rest = groups
+    candidates = " UNION ".join(
+        f"""
+        SELECT re.id, re.routine_id, re.exercise_id FROM routineexercise AS re
+        WHERE re.{_FTS_LINK_COLUMN[table]} IN (SELECT rowid FROM {table} WHERE {table} MATCH ?)
+        """
+        for table, _expression in first
+    )
+    where = " AND ".join(
+        "({})".format(
+            " OR ".join(
+                f"{_FTS_LINK_COLUMN[table]} IN (SELECT rowid FROM {table} WHERE {table} MATCH ?)"
+                for table, _expression in branches
+            )
+        )
+        for branches in rest
+    ) or "1"
+    params = tuple(expression for branches in groups for _table, expression in branches)
     connection = session.connection()
     try:
         rows = connection.exec_driver_sql(
-            """
-            SELECT routine_id, SUM(1) AS hits
-            FROM routine_content_fts
-            WHERE routine_content_fts MATCH ?
-            GROUP BY routine_id;
-            """,
-            (query,),
+            f"SELECT routine_id, COUNT(*) AS hits FROM ({candidates}) WHERE {where} GROUP BY routine_id;",
+            params,
         )
     except OperationalError:
         return {}
@@ -280,30 +462,116 @@ def _load_fts_scores(session: Session, query: str) -> Dict[int, float]:
     return {int(row[0]): float(row[1]) for row in rows}
 
 
-def _build_sections_for_routine(
-    session: Session,
+def _fts_groups(query: str) -> List[str]:
+    # Una consulta de términos sueltos (AND implícito) se parte en un grupo
+    # por término: cada uno puede casar en la rutina o en el ejercicio. Con
+    # operadores o paréntesis va entera como un grupo.
+    terms = _FTS_TERM_RE.findall(query)
+    if not terms or "".join(terms) != re.sub(r"\s+", "", query):
+        return [query]
+    if any(term in _FTS_OPERATORS for term in terms):
+        return [query]
+    return terms
+
+
+def _fts_branches(group: str) -> List[Tuple[str, str]]:
+    # (tabla FTS, expresión) en las que se evalúa un grupo. Sin filtros de
+    # columna, en las dos tablas tal cual. Con filtros, cada alternativa del
+    # OR de primer nivel va solo a la tabla que tiene esas columnas, con los
+    # nombres del índice antiguo (routine_name, exercise_name) traducidos.
+    if not _COLUMN_FILTER_RE.search(_FTS_PHRASE_RE.sub('""', group)):
+        return [(table, group) for table in _FTS_TABLE_COLUMNS]
+    branches: List[Tuple[str, str]] = []
+    for alternative in _split_top_level_or(group):
+        for table, columns in _FTS_TABLE_COLUMNS.items():
+            expression = _expression_for_table(alternative, table, columns)
+            if expression is not None:
+                branches.append((table, expression))
+    return branches
+
+
+def _split_top_level_or(expression: str) -> List[str]:
+    parts: List[str] = []
+    depth, start, in_phrase = 0, 0, False
+    for index, char in enumerate(expression):
+        if char == '"':
+            in_phrase = not in_phrase
+        elif in_phrase:
+            continue
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0 and expression.startswith(" OR ", index):
+            parts.append(expression[start:index])
+            start = index + len(" OR ")
+    parts.append(expression[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _expression_for_table(expression: str, table: str, columns: Sequence[str]) -> Optional[str]:
+    # None si la expresión usa alguna columna que esta tabla no tiene.
+    missing = False
+
+    def rewrite(match: "re.Match[str]") -> str:
+        nonlocal missing
+        braced = match.group("columns").startswith("{")
+        negated = match.group("prefix").strip() == "-"
+        mapped: List[str] = []
+        outside = False
+        for name in match.group("columns").strip("{}").lower().split():
+            owner, column = _FTS_LEGACY_COLUMNS.get(name, (table, name))
+            if owner == table and column in columns:
+                mapped.append(column)
+            else:
+                outside = True
+        # '{a b}:x' casa si lo casa alguna de sus columnas: en cada tabla se
+        # queda con las suyas. Negado o de una sola columna, la tabla tiene
+        # que tenerlas todas.
+        if not mapped or (outside and (negated or not braced)):
+            missing = True
+            return match.group(0)
+        filtered = "{" + " ".join(mapped) + "}" if braced else mapped[0]
+        return f"{match.group('prefix')}{filtered}:"
+
+    # Las frases no se tocan: pueden contener ':'.
+    pieces = re.split(r'("[^"]*")', expression)
+    rewritten = "".join(
+        piece if piece.startswith('"') else _COLUMN_FILTER_RE.sub(rewrite, piece)
+        for piece in pieces
+    )
+    return None if missing else rewritten
+
+
+def build_sections_for_routine(
+    catalog: Catalog,
     routine: Routine,
     pathologies: Iterable[str],
     level: str,
 ) -> Dict[str, SectionPayload]:
     section_items: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
 
-    link_stmt = (
-        select(RoutineExercise, Exercise)
-        .join(Exercise, RoutineExercise.exercise_id == Exercise.id)
-        .where(RoutineExercise.routine_id == routine.id)
-        .order_by(RoutineExercise.section, RoutineExercise.order_index)
-    )
-
-    rows: Iterable[Tuple[RoutineExercise, Exercise]] = session.exec(link_stmt)
+    rows: List[LinkRow] = catalog.links_for(routine.id)
+    taken: Dict[str, Set[int]] = defaultdict(set)
+    for link, exercise in rows:
+        taken[link.section].add(exercise.id)
 
     for link, exercise in rows:
-        if _is_exercise_excluded(exercise, pathologies):
-            continue
-        payload = _exercise_to_payload(exercise)
+        replaced: Optional[Exercise] = None
+        if is_exercise_excluded(exercise, pathologies):
+            # Sustituir por una alternativa segura del mismo patrón en lugar
+            # de dejar la sección más corta.
+            substitute = catalog.substitute_for(exercise, pathologies, taken[link.section])
+            if substitute is None:
+                continue
+            replaced, exercise = exercise, substitute
+            taken[link.section].add(exercise.id)
+        payload = exercise_to_payload(exercise)
+        if replaced is not None:
+            payload["substitutes"] = {"exercise_id": replaced.id, "name": replaced.name}
 
         # Escalar series por nivel (si hay sets)
-        payload["sets"] = _scale_sets_by_level(payload.get("sets"), level)
+        payload["sets"] = scale_sets_by_level(payload.get("sets"), level)
 
         section_items[link.section].append(payload)
 
@@ -321,14 +589,14 @@ def _build_sections_for_routine(
     for section in SECTION_ORDER:
         items = section_items[section]
         sections[section] = {
-            "minutes": _estimate_minutes(section, items),
+            "minutes": estimate_minutes(section, items),
             "items": items,
         }
 
     return sections
 
 
-def _scale_sets_by_level(base_sets: Optional[int], level: str) -> Optional[int]:
+def scale_sets_by_level(base_sets: Optional[int], level: str) -> Optional[int]:
     if base_sets is None:
         return None
     bump = 0
@@ -339,7 +607,7 @@ def _scale_sets_by_level(base_sets: Optional[int], level: str) -> Optional[int]:
     return max(1, base_sets + bump)
 
 
-def _is_exercise_excluded(exercise: Exercise, pathologies: Iterable[str]) -> bool:
+def is_exercise_excluded(exercise: Exercise, pathologies: Iterable[str]) -> bool:
     pathology_set = set(pathologies)
     if not pathology_set:
         return False
@@ -347,7 +615,7 @@ def _is_exercise_excluded(exercise: Exercise, pathologies: Iterable[str]) -> boo
     return bool(pathology_set & exercise_contras)
 
 
-def _exercise_to_payload(exercise: Exercise) -> Dict[str, Any]:
+def exercise_to_payload(exercise: Exercise) -> Dict[str, Any]:
     return {
         "exercise_id": exercise.id,
         "name": exercise.name,
@@ -362,7 +630,7 @@ def _exercise_to_payload(exercise: Exercise) -> Dict[str, Any]:
     }
 
 
-def _estimate_minutes(section: str, items: List[Dict[str, Any]]) -> int:
+def estimate_minutes(section: str, items: List[Dict[str, Any]]) -> int:
     total = sum(item.get("minutes") or 0 for item in items)
     if total == 0:
         if section == "warmup":
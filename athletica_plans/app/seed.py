@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from sqlmodel import Session, select
 
-from .db import get_session, rebuild_fts
+from .db import bump_catalog_version, get_session, init_db, rebuild_fts
 from .models import Exercise, Routine, RoutineExercise
 
 
@@ -63,8 +63,8 @@ SECTION_TEMPLATES: Dict[str, Dict[str, List[str]]] = {
 }
 
 
-def seed() -> None:
-    with get_session() as session:
+def seed(tenant: Optional[str] = None) -> None:
+    with get_session(tenant) as session:
         routine_exists = session.exec(select(Routine).limit(1)).first()
         if routine_exists:
             return
@@ -97,6 +97,16 @@ def seed() -> None:
         session.commit()
 
         rebuild_fts(session)
+        bump_catalog_version(session)
+        session.commit()
+
+
+def provision_tenant(tenant: str, with_seed: bool = True) -> None:
+    # Alta de un gimnasio: crea su fichero SQLite con el esquema completo y,
+    # si se pide, el catálogo base. Es idempotente.
+    init_db(tenant)
+    if with_seed:
+        seed(tenant)
 
 
 def _fetch_ids(session: Session, model: type) -> Dict[str, int]:
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Claves con contadores que se conservan (LRU); las llamadas en curso no
+# dependen de este límite.
+MAX_TRACKED_KEYS = 1024
+
+
+@dataclass
+class FlightStats:
+    calls: int = 0
+    executions: int = 0
+    shared: int = 0
+    max_waiters: int = 0
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.future: Future = Future()
+        # Marcado como en ejecución: nadie puede cancelarlo para el resto.
+        self.future.set_running_or_notify_cancel()
+        self.waiters = 1
+
+
+class SingleFlight:
+    # Agrupa llamadas idénticas concurrentes: la primera con una clave ejecuta
+    # la función y las que llegan mientras tanto (hilos o tareas asyncio)
+    # reciben el mismo resultado o la misma excepción. La entrada se borra al
+    # terminar, así que no hay caché de resultados.
+    def __init__(self, max_tracked_keys: int = MAX_TRACKED_KEYS) -> None:
+        self.max_tracked_keys = max_tracked_keys
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._stats: "OrderedDict[Hashable, FlightStats]" = OrderedDict()
+
+    def do(self, key: Hashable, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        flight, leader = self._join(key)
+        if leader:
+            self._run(key, flight, func, args, kwargs)
+        return flight.future.result()
+
+    async def do_async(
+        self, key: Hashable, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        flight, leader = self._join(key)
+        if leader:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(None, self._run, key, flight, func, args, kwargs)
+        # shield: cancelar a un solo esperador no cancela el cálculo compartido.
+        return await asyncio.shield(asyncio.wrap_future(flight.future))
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            keys = {str(key): asdict(stats) for key, stats in self._stats.items()}
+        calls = sum(item["calls"] for item in keys.values())
+        shared = sum(item["shared"] for item in keys.values())
+        return {
+            "calls": calls,
+            "executions": calls - shared,
+            "shared": shared,
+            "dedup_ratio": round(shared / calls, 4) if calls else 0.0,
+            "keys": keys,
+        }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def _join(self, key: Hashable) -> Tuple[_Flight, bool]:
+        with self._lock:
+            stats = self._stats.pop(key, None) or FlightStats()
+            self._stats[key] = stats
+            while len(self._stats) > self.max_tracked_keys:
+                self._stats.popitem(last=False)
+            stats.calls += 1
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                stats.shared += 1
+                stats.max_waiters = max(stats.max_waiters, flight.waiters)
+                return flight, False
+            flight = _Flight()
+            self._flights[key] = flight
+            stats.executions += 1
+            stats.max_waiters = max(stats.max_waiters, 1)
+            return flight, True
+
+    def _run(
+        self,
+        key: Hashable,
+        flight: _Flight,
+        func: Callable[..., Any],
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+    ) -> None:
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as exc:
+            self._finish(key)
+            flight.future.set_exception(exc)
+        else:
+            self._finish(key)
+            flight.future.set_result(result)
+
+    def _finish(self, key: Hashable) -> None:
+        # Se retira antes de publicar el resultado: quien llegue después
+        # ejecuta de nuevo en lugar de recibir un resultado ya servido.
+        with self._lock:
+            self._flights.pop(key, None)
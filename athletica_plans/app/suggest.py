@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+from .catalog import Catalog, get_catalog
+from .db import EXERCISE_TRIGRAM_TABLE, get_read_session
+from .tenants import current_tenant
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 25
+CACHE_SIZE = 4096
+# Fracción mínima de trigramas de la consulta que debe contener un ejercicio.
+MIN_TRIGRAM_OVERLAP = 0.5
+
+Suggestion = Dict[str, Any]
+
+
+def suggest_exercises(
+    q: str,
+    limit: int = DEFAULT_LIMIT,
+    session: Optional[Session] = None,
+) -> List[Suggestion]:
+    if session is None:
+        with get_read_session() as own_session:
+            return suggest_exercises(q, limit, own_session)
+
+    text = " ".join(q.lower().split())
+    if not text:
+        return []
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    # Solo los cambios de ejercicios invalidan las sugerencias; editar una
+    # rutina o un enlace no las enfría. Las entradas de versiones antiguas o
+    # de otros tenants salen solas del LRU.
+    version = get_catalog(session).exercises_version
+    return [dict(item) for item in _cached_suggestions(current_tenant(), version, text, limit)]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_suggestions(
+    tenant: str, version: int, text: str, limit: int
+) -> Tuple[Suggestion, ...]:
+    matches: List[Suggestion] = []
+    if len(text) >= 3:
+        with get_read_session() as session:
+            matches = _trigram_matches(session, text, limit)
+    if not matches:
+        matches = _prefix_matches(get_catalog(), text, limit)
+    return tuple(matches)
+
+
+def _trigrams(text: str) -> List[str]:
+    grams: List[str] = []
+    for word in text.split():
+        for start in range(len(word) - 2):
+            gram = word[start:start + 3]
+            if gram not in grams:
+                grams.append(gram)
+    return grams
+
+
+def _trigram_matches(session: Session, text: str, limit: int) -> List[Suggestion]:
+    # OR de los trigramas de cada palabra: tolera entradas parciales y erratas
+    # ("sentadila"), y bm25 premia a quien comparte más trigramas.
+    grams = _trigrams(text)
+    if not grams:
+        return []
+    query = " OR ".join('"{}"'.format(gram.replace('"', '""')) for gram in grams)
+    try:
+        rows = session.connection().exec_driver_sql(
+            f"""
+            SELECT rowid, name, pattern, notes
+            FROM {EXERCISE_TRIGRAM_TABLE}
+            WHERE {EXERCISE_TRIGRAM_TABLE} MATCH ?
+              AND rank MATCH 'bm25(10.0, 2.0, 1.0)'
+            ORDER BY rank
+            LIMIT ?;
+            """,
+            (query, limit * 3),
+        ).fetchall()
+    except OperationalError:
+        return []
+
+    matches: List[Suggestion] = []
+    for exercise_id, name, pattern, notes in rows:
+        haystack = " ".join(value or "" for value in (name, pattern, notes)).lower()
+        overlap = sum(1 for gram in grams if gram in haystack) / len(grams)
+        if overlap < MIN_TRIGRAM_OVERLAP:
+            continue
+        matches.append({"exercise_id": int(exercise_id), "name": name, "pattern": pattern})
+        if len(matches) >= limit:
+            break
+    return matches
+
+
+def _prefix_matches(catalog: Catalog, text: str, limit: int) -> List[Suggestion]:
+    matches: List[Suggestion] = []
+    for exercise in sorted(catalog.exercises.values(), key=lambda item: item.name):
+        words = exercise.name.lower().split()
+        if exercise.name.lower().startswith(text) or any(word.startswith(text) for word in words):
+            matches.append(
+                {"exercise_id": exercise.id, "name": exercise.name, "pattern": exercise.pattern}
+            )
+            if len(matches) >= limit:
+                break
+    return matches
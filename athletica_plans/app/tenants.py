@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy.engine import Engine
+
+# Cada gimnasio (tenant) tiene su propio fichero SQLite. El tenant de la
+# petición llega por cabecera o por prefijo de ruta (/t/<tenant>/...) y viaja
+# en una ContextVar; sin ninguno de los dos se usa el tenant por defecto.
+DEFAULT_TENANT = "default"
+TENANT_HEADER = "x-athletica-tenant"
+TENANT_PATH_PREFIX = "/t/"
+_TENANT_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+# Coste fijo estimado de un tenant abierto (engine y caché de páginas de
+# SQLite); sus cachés suman lo que declare su estimated_bytes().
+ENGINE_BYTES = 1024 * 1024
+# Cada cuánto se revisa el LRU como mucho (al abrir un tenant y al terminar
+# cada petición).
+SWEEP_INTERVAL_SECONDS = 1.0
+
+_current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+
+def validate_tenant(tenant: str) -> str:
+    tenant = tenant.strip().lower()
+    if not _TENANT_RE.match(tenant):
+        raise ValueError(f"Invalid tenant '{tenant}'.")
+    return tenant
+
+
+def current_tenant() -> str:
+    return _current_tenant.get()
+
+
+@contextmanager
+def use_tenant(tenant: str) -> Iterator[str]:
+    token = _current_tenant.set(validate_tenant(tenant))
+    try:
+        yield _current_tenant.get()
+    finally:
+        _current_tenant.reset(token)
+
+
+class TenantSlot:
+    # Recursos de un tenant abierto: su engine y las cachés que dependen de
+    # su catálogo (catálogo en memoria, portada...). Se liberan juntos.
+    def __init__(self, tenant: str, engine: Engine) -> None:
+        self.tenant = tenant
+        self.engine = engine
+        self.cache: Dict[str, Any] = {}
+        self.last_used = time.monotonic()
+
+    def release(self) -> None:
+        self.engine.dispose()
+        for value in list(self.cache.values()):
+            close = getattr(value, "close", None)
+            if callable(close):
+                close()
+
+    def estimated_bytes(self) -> int:
+        total = ENGINE_BYTES
+        for value in list(self.cache.values()):
+            size = getattr(value, "estimated_bytes", None)
+            if callable(size):
+                total += size()
+        return total
+
+
+class TenantRegistry:
+    # LRU de tenants abiertos. Se abren al primer uso y se cierran cuando la
+    # memoria estimada supera 'max_bytes' (los menos usados primero) o llevan
+    # 'idle_seconds' sin uso. El tenant por defecto y los que tienen
+    # peticiones en curso (pinned) no se cierran nunca.
+    def __init__(
+        self,
+        engine_factory: Callable[[str], Engine],
+        tenant_exists: Callable[[str], bool],
+        max_bytes: int,
+        idle_seconds: float,
+    ) -> None:
+        self.engine_factory = engine_factory
+        self.tenant_exists = tenant_exists
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._slots: "OrderedDict[str, TenantSlot]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.evicted = 0
+        self._last_sweep = 0.0
+
+    def slot(self, tenant: Optional[str] = None, create: bool = False) -> TenantSlot:
+        tenant = tenant or current_tenant()
+        now = time.monotonic()
+        evicted: List[TenantSlot] = []
+        with self._lock:
+            slot = self._slots.get(tenant)
+            opened = slot is None
+            if slot is None:
+                if not create and not self.tenant_exists(tenant):
+                    raise LookupError(f"Unknown tenant '{tenant}'.")
+                slot = TenantSlot(tenant, self.engine_factory(tenant))
+                self._slots[tenant] = slot
+                self.opened += 1
+            self._slots.move_to_end(tenant)
+            slot.last_used = now
+            if opened or now - self._last_sweep >= SWEEP_INTERVAL_SECONDS:
+                evicted = self._pick_evictions(now)
+        _release(evicted)
+        return slot
+
+    def engine(self, tenant: Optional[str] = None) -> Engine:
+        return self.slot(tenant).engine
+
+    def cache(self, tenant: Optional[str] = None) -> Dict[str, Any]:
+        return self.slot(tenant).cache
+
+    def is_open(self, tenant: str) -> bool:
+        with self._lock:
+            return tenant in self._slots
+
+    @contextmanager
+    def pinned(self, tenant: str) -> Iterator[None]:
+        # Mientras dure la petición el tenant no se cierra, aunque supere el
+        # tiempo de inactividad o el presupuesto. Al soltarlo se revisa el LRU.
+        with self._lock:
+            self._pins[tenant] = self._pins.get(tenant, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                remaining = self._pins.pop(tenant) - 1
+                if remaining:
+                    self._pins[tenant] = remaining
+            self.sweep()
+
+    def sweep(self) -> List[str]:
+        # Como evict_idle, pero como mucho una vez por SWEEP_INTERVAL_SECONDS.
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+                return []
+            evicted = self._pick_evictions(now)
+        _release(evicted)
+        return [old.tenant for old in evicted]
+
+    def evict_idle(self) -> List[str]:
+        with self._lock:
+            evicted = self._pick_evictions(time.monotonic())
+        _release(evicted)
+        return [old.tenant for old in evicted]
+
+    def close(self, tenant: str) -> bool:
+        with self._lock:
+            slot = self._slots.pop(tenant, None) if tenant != DEFAULT_TENANT else None
+        if slot is None:
+            return False
+        slot.release()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            slots = list(self._slots.values())
+        now = time.monotonic()
+        return {
+            "open": len(slots),
+            "opened": self.opened,
+            "evicted": self.evicted,
+            "estimated_bytes": sum(slot.estimated_bytes() for slot in slots),
+            "max_bytes": self.max_bytes,
+            "tenants": {
+                slot.tenant: {
+                    "estimated_bytes": slot.estimated_bytes(),
+                    "idle_seconds": round(now - slot.last_used, 3),
+                }
+                for slot in slots
+            },
+        }
+
+    def _pick_evictions(self, now: float) -> List[TenantSlot]:
+        # Se llama con el lock tomado; el dispose de los engines se hace fuera.
+        self._last_sweep = now
+        evicted: List[TenantSlot] = []
+        for tenant, slot in list(self._slots.items()):
+            if tenant == DEFAULT_TENANT or tenant in self._pins:
+                continue
+            if now - slot.last_used > self.idle_seconds:
+                evicted.append(self._slots.pop(tenant))
+        total = sum(slot.estimated_bytes() for slot in self._slots.values())
+        for tenant in list(self._slots):
+            if total <= self.max_bytes or len(self._slots) <= 1:
+                break
+            if tenant == DEFAULT_TENANT or tenant in self._pins:
+                continue
+            # El más recientemente usado (el que se acaba de abrir) es el último.
+            if tenant == next(reversed(self._slots)):
+                break
+            slot = self._slots.pop(tenant)
+            total -= slot.estimated_bytes()
+            evicted.append(slot)
+        self.evicted += len(evicted)
+        return evicted
+
+
+def _release(slots: List[TenantSlot]) -> None:
+    for slot in slots:
+        slot.release()
+
+
+class TenantMiddleware:
+    # Middleware ASGI: resuelve el tenant (cabecera o prefijo /t/<tenant>/),
+    # lo fija en la ContextVar durante la petición y responde 400/404 si el
+    # nombre no es válido o el tenant no existe. Con 'registry', el tenant
+    # queda fijado (pinned) hasta terminar la respuesta.
+    def __init__(
+        self,
+        app: Any,
+        tenant_exists: Callable[[str], bool],
+        registry: Optional[TenantRegistry] = None,
+    ) -> None:
+        self.app = app
+        self.tenant_exists = tenant_exists
+        self.registry = registry
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        # Según ASGI 'path' incluye 'root_path': el prefijo de tenant se
+        # añade a 'root_path' y el enrutado ve la ruta sin él.
+        path = scope.get("path", "")
+        root_path = scope.get("root_path", "")
+        route_path = path[len(root_path):] if path.startswith(root_path) else path
+        raw: Optional[str] = None
+        if route_path.startswith(TENANT_PATH_PREFIX):
+            raw, _, rest = route_path[len(TENANT_PATH_PREFIX):].partition("/")
+            prefix = f"{root_path}{TENANT_PATH_PREFIX}{raw}"
+            scope = {**scope, "path": f"{prefix}/{rest}", "root_path": prefix}
+            route_path = f"/{rest}"
+        else:
+            for name, value in scope.get("headers", []):
+                if name == TENANT_HEADER.encode():
+                    raw = value.decode("latin-1")
+                    break
+
+        tenant = DEFAULT_TENANT
+        if raw is not None:
+            try:
+                tenant = validate_tenant(raw)
+            except ValueError as exc:
+                await _send_error(send, 400, str(exc))
+                return
+            if not self.tenant_exists(tenant):
+                await _send_error(send, 404, f"Unknown tenant '{tenant}'.")
+                return
+
+        token = _current_tenant.set(tenant)
+        try:
+            if self.registry is None:
+                await self.app(scope, receive, _vary_on_tenant(send, route_path))
+            else:
+                with self.registry.pinned(tenant):
+                    await self.app(scope, receive, _vary_on_tenant(send, route_path))
+        finally:
+            _current_tenant.reset(token)
+
+
+def _vary_on_tenant(send: Any, path: str) -> Any:
+    # Una misma URL devuelve contenido distinto según la cabecera de tenant.
+    if path.startswith("/static/"):
+        return send
+
+    async def wrapped(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            headers = list(message.get("headers", []))
+            vary = [value for name, value in headers if name.lower() == b"vary"]
+            headers = [(name, value) for name, value in headers if name.lower() != b"vary"]
+            values = [part.strip() for value in vary for part in value.decode().split(",") if part.strip()]
+            if TENANT_HEADER not in {part.lower() for part in values}:
+                values.append("X-Athletica-Tenant")
+            headers.append((b"vary", ", ".join(values).encode()))
+            message = {**message, "headers": headers}
+        await send(message)
+
+    return wrapped
+
+
+async def _send_error(send: Any, status: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
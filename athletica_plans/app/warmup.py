@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .catalog import get_catalog
+from .program import build_program
+from .query_log import QUERY_LOG_ENV, top_requests
+from .routers.search import ALLOWED_OBJECTIVES
+from .search import build_results, search_key
+from .suggest import suggest_exercises
+from .tenants import current_tenant
+
+WarmupStep = Tuple[str, Callable[[], Any]]
+
+# Búsquedas representativas: un objetivo cada vez, una multi-objetivo con
+# patología (mezcla y sustituciones) y una con texto (FTS y expansión).
+WARMUP_REQUESTS: List[Dict[str, Any]] = [
+    {"objectives": [objective], "session_minutes": 45, "pathologies": [], "level": "medio", "q": None}
+    for objective in ALLOWED_OBJECTIVES
+] + [
+    {
+        "objectives": ["fuerza", "movilidad"],
+        "session_minutes": 60,
+        "pathologies": ["lumbar"],
+        "level": "principiante",
+        "q": None,
+    },
+    {"objectives": ["hipertrofia"], "session_minutes": 45, "pathologies": [], "level": "medio", "q": "sentadilla"},
+]
+WARMUP_SUGGESTIONS = ("sen", "press")
+# Búsquedas más frecuentes del registro que se añaden al calentamiento.
+WARMUP_TOP_LOGGED = 20
+
+
+class WarmupState:
+    # Estado del calentamiento del proceso; /api/ready lo expone tal cual.
+    def __init__(self) -> None:
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[str, float] = {}
+        self.searches = 0
+        self.error: Optional[str] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def ready(self) -> bool:
+        # Un calentamiento que ha fallado no deja el proceso listo.
+        return self.finished and self.error is None
+
+    @property
+    def failed(self) -> bool:
+        return self.finished and self.error is not None
+
+    @property
+    def status(self) -> str:
+        if self.failed:
+            return "failed"
+        return "ready" if self.ready else "warming"
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at is not None:
+            end = self.finished_at if self.finished_at is not None else time.perf_counter()
+            elapsed = round((end - self.started_at) * 1000, 3)
+        return {
+            "ready": self.ready,
+            "status": self.status,
+            "elapsed_ms": elapsed,
+            "steps_ms": dict(self.steps),
+            "searches": self.searches,
+            "error": self.error,
+        }
+
+
+warmup_state = WarmupState()
+
+
+def warmup_requests() -> List[Dict[str, Any]]:
+    # Primero lo más pedido según el registro de búsquedas (si existe) y
+    # después el conjunto fijo, sin repetir combinaciones.
+    requests: Dict[str, Dict[str, Any]] = {}
+    log_path = os.getenv(QUERY_LOG_ENV)
+    if log_path:
+        for entry in top_requests(Path(log_path), WARMUP_TOP_LOGGED, tenant=current_tenant()):
+            requests.setdefault(entry["key"], entry["request"])
+    for params in WARMUP_REQUESTS:
+        requests.setdefault(search_key(**params), dict(params))
+    return list(requests.values())
+
+
+def warm_up(
+    extra_steps: Sequence[WarmupStep] = (),
+    state: Optional[WarmupState] = None,
+) -> WarmupState:
+    # Carga el catálogo y ejecuta las búsquedas habituales para que la caché
+    # de páginas de SQLite, la caché de sentencias compiladas de SQLAlchemy y
+    # los imports perezosos estén calientes antes de recibir tráfico. Un
+    # fallo se anota y el proceso queda "failed" (503 en /api/ready).
+    state = state or warmup_state
+    state.started_at = time.perf_counter()
+    steps: List[WarmupStep] = [
+        ("catalog", get_catalog),
+        ("searches", lambda: _run_searches(state)),
+        ("program", _run_program),
+        ("suggest", _run_suggestions),
+        *extra_steps,
+    ]
+    try:
+        for name, func in steps:
+            started = time.perf_counter()
+            func()
+            state.steps[name] = round((time.perf_counter() - started) * 1000, 3)
+    except Exception as exc:
+        state.error = f"{type(exc).__name__}: {exc}"
+    finally:
+        state.finished_at = time.perf_counter()
+        state._done.set()
+    return state
+
+
+def start_warmup(
+    extra_steps: Sequence[WarmupStep] = (),
+    state: Optional[WarmupState] = None,
+) -> Optional[threading.Thread]:
+    # En segundo plano: /api/health responde desde el arranque y /api/ready
+    # pasa a 200 cuando termina. Una vez por proceso. El hilo hereda el
+    # contexto (tenant actual) para calentar la misma base que el arranque.
+    state = state or warmup_state
+    with state._lock:
+        if state.started_at is not None:
+            return None
+        state.started_at = time.perf_counter()
+    context = contextvars.copy_context()
+    thread = threading.Thread(
+        target=context.run,
+        args=(warm_up, extra_steps, state),
+        name="athletica-warmup",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def _run_searches(state: WarmupState) -> None:
+    for params in warmup_requests():
+        build_results(**params)
+        state.searches += 1
+
+
+def _run_program() -> None:
+    params = dict(WARMUP_REQUESTS[0])
+    params.pop("q", None)
+    build_program(days_per_week=3, **params)
+
+
+def _run_suggestions() -> None:
+    for text in WARMUP_SUGGESTIONS:
+        suggest_exercises(text)
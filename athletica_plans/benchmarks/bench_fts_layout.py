@@ -0,0 +1,125 @@
+"""Compara el índice FTS antiguo (una fila por enlace rutina-ejercicio, con
+los textos copiados) con el actual (external content sobre 'routine' y
+'exercise'): tamaño en disco, tiempo de reconstrucción y latencia de MATCH,
+comprobando que ambos puntúan igual.
+
+Uso (desde athletica_plans/):  python -m benchmarks.bench_fts_layout
+"""
+from __future__ import annotations
+
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection
+from sqlmodel import Session
+
+from app.db import EXERCISE_FTS_TABLE, LEGACY_FTS_TABLE, ROUTINE_FTS_TABLE, rebuild_fts
+from app.search import _match_fts
+
+from .bench_memory_db import scaled_database
+from .bench_ranking import timed
+
+QUERIES = [
+    "press",
+    "remo mancuernas",
+    "sentadilla OR remo",
+    "mancuer*",
+    '"peso muerto"',
+    "movilidad cadera",
+    "pattern:empuje",
+    "tags:fuerza exercise_name:press",
+]
+
+
+def build_legacy_index(connection: Connection) -> None:
+    connection.exec_driver_sql(
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {LEGACY_FTS_TABLE}
+        USING fts5(
+            routine_id UNINDEXED,
+            exercise_id UNINDEXED,
+            routine_name,
+            exercise_name,
+            notes,
+            pattern,
+            tags
+        );
+        """
+    )
+    connection.exec_driver_sql(f"DELETE FROM {LEGACY_FTS_TABLE};")
+    connection.exec_driver_sql(
+        f"""
+        INSERT INTO {LEGACY_FTS_TABLE}
+        SELECT re.routine_id, re.exercise_id, r.name, e.name, COALESCE(e.notes, ''), e.pattern, r.tags
+        FROM routineexercise AS re
+        JOIN routine AS r ON r.id = re.routine_id
+        JOIN exercise AS e ON e.id = re.exercise_id;
+        """
+    )
+
+
+def legacy_match(connection: Connection, query: str) -> Dict[int, float]:
+    rows = connection.exec_driver_sql(
+        f"""
+        SELECT routine_id, SUM(1) FROM {LEGACY_FTS_TABLE}
+        WHERE {LEGACY_FTS_TABLE} MATCH ? GROUP BY routine_id;
+        """,
+        (query,),
+    )
+    return {int(row[0]): float(row[1]) for row in rows}
+
+
+def index_bytes(connection: Connection, table: str) -> int:
+    # Páginas de las tablas sombra de FTS5 (<tabla>_data, _idx, _content...).
+    return connection.exec_driver_sql(
+        "SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name LIKE ? || '\\_%' ESCAPE '\\';",
+        (table,),
+    ).scalar()
+
+
+def run(routines: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "scaled.db"
+        scaled_database(path, routines)
+        engine = create_engine(f"sqlite:///{path}")
+        try:
+            with Session(engine) as session:
+                connection = session.connection()
+                started = time.perf_counter()
+                build_legacy_index(connection)
+                legacy_rebuild = (time.perf_counter() - started) * 1000
+                started = time.perf_counter()
+                rebuild_fts(session)
+                current_rebuild = (time.perf_counter() - started) * 1000
+                session.commit()
+
+                connection = session.connection()
+                links = connection.exec_driver_sql("SELECT COUNT(*) FROM routineexercise;").scalar()
+                legacy_size = index_bytes(connection, LEGACY_FTS_TABLE)
+                current_size = sum(
+                    index_bytes(connection, table) for table in (ROUTINE_FTS_TABLE, EXERCISE_FTS_TABLE)
+                )
+                print(f"\n== +{routines} rutinas, {links} enlaces (mediana de {repeat} repeticiones) ==")
+                print(f"{'':<28}{'antiguo':>12}{'actual':>12}")
+                print(f"{'índice (KiB)':<28}{legacy_size / 1024:>12.1f}{current_size / 1024:>12.1f}")
+                print(f"{'reconstrucción (ms)':<28}{legacy_rebuild:>12.1f}{current_rebuild:>12.1f}")
+                for query in QUERIES:
+                    same = legacy_match(connection, query) == _match_fts(session, query)
+                    legacy_ms = timed(lambda: legacy_match(connection, query), repeat)
+                    current_ms = timed(lambda: _match_fts(session, query), repeat)
+                    label = f"MATCH {query} (ms)"
+                    print(f"{label:<28}{legacy_ms:>12.3f}{current_ms:>12.3f}{'' if same else '  DISTINTO':>10}")
+        finally:
+            engine.dispose()
+
+
+def main() -> None:
+    run(2_000, repeat=50)
+    run(20_000, repeat=15)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Compara la latencia de las consultas FTS de búsqueda y autocompletado
+sirviendo desde el fichero en disco y desde la copia en memoria
+(ATHLETICA_SERVING_MODE=memory), sobre la base de seed escalada.
+
+Uso (desde athletica_plans/):  python -m benchmarks.bench_memory_db
+"""
+from __future__ import annotations
+
+import random
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlmodel import Session
+
+from app import db
+from app.db import rebuild_fts
+from app.memory_db import MemoryReplica
+from app.search import _match_fts
+from app.seed import provision_tenant
+from app.suggest import _trigram_matches
+
+from .bench_ranking import timed
+
+FTS_QUERIES = ["press", "sentadilla OR remo", "movilidad", "mancuer*", '"peso muerto"']
+SUGGEST_QUERIES = ["sentadila", "press mil", "respiracion"]
+
+
+def scaled_database(target: Path, routines: int, seed: int = 5) -> None:
+    # Base de seed recién provisionada en la carpeta de 'target' (nunca el
+    # fichero del repo) con 'routines' rutinas sintéticas más, cada una con
+    # los enlaces de una rutina existente, y el FTS reconstruido. El nombre
+    # del fichero hace de tenant: 'scaled.db' -> tenant 'scaled'.
+    tenants_dir, db.TENANTS_DIR = db.TENANTS_DIR, target.parent
+    try:
+        provision_tenant(target.stem)
+        db.tenant_registry.close(target.stem)
+    finally:
+        db.TENANTS_DIR = tenants_dir
+    rng = random.Random(seed)
+    engine = create_engine(f"sqlite:///{target}")
+    with engine.begin() as conn:
+        templates = conn.exec_driver_sql(
+            "SELECT id, objective, session_minutes, level, tags FROM routine;"
+        ).fetchall()
+        links = conn.exec_driver_sql(
+            "SELECT routine_id, exercise_id, section, order_index FROM routineexercise;"
+        ).fetchall()
+        by_routine = {}
+        for routine_id, exercise_id, section, order_index in links:
+            by_routine.setdefault(routine_id, []).append((exercise_id, section, order_index))
+        next_id = conn.exec_driver_sql("SELECT MAX(id) FROM routine;").scalar() + 1
+        for index in range(routines):
+            template_id, objective, minutes, level, tags = rng.choice(templates)
+            routine_id = next_id + index
+            conn.exec_driver_sql(
+                "INSERT INTO routine (id, name, objective, session_minutes, level, tags)"
+                " VALUES (?, ?, ?, ?, ?, ?);",
+                (routine_id, f"Rutina {objective} {index}", objective, minutes, level, tags),
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO routineexercise (routine_id, exercise_id, section, order_index)"
+                " VALUES " + ", ".join("(?, ?, ?, ?)" for _ in by_routine[template_id]) + ";",
+                tuple(value for link in by_routine[template_id] for value in (routine_id, *link)),
+            )
+    with Session(engine) as session:
+        rebuild_fts(session)
+        session.commit()
+    engine.dispose()
+
+
+def run(routines: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "scaled.db"
+        scaled_database(path, routines)
+        disk = create_engine(f"sqlite:///{path}")
+        replica = MemoryReplica(path, reload_seconds=3600)
+        size_mb = path.stat().st_size / 2**20
+        print(f"\n== +{routines} rutinas ({size_mb:.1f} MiB; mediana de {repeat} repeticiones, ms) ==")
+        print(f"{'consulta':<32}{'disco':>10}{'memoria':>10}")
+        try:
+            for kind, queries, func in (
+                ("fts", FTS_QUERIES, _match_fts),
+                ("trigram", SUGGEST_QUERIES, lambda session, text: _trigram_matches(session, text, 8)),
+            ):
+                for query in queries:
+                    results = []
+                    for engine in (disk, replica.engine()):
+                        with Session(engine) as session:
+                            results.append(timed(lambda: func(session, query), repeat))
+                    print(f"{kind + ' ' + query:<32}{results[0]:>10.3f}{results[1]:>10.3f}")
+        finally:
+            replica.close()
+            disk.dispose()
+
+
+def main() -> None:
+    run(2_000, repeat=50)
+    run(20_000, repeat=15)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Compara el ranking en Python con el vectorizado (NumPy) sobre catálogos
+sintéticos de 10k y 100k rutinas.
+
+Uso (desde athletica_plans/):  python -m benchmarks.bench_ranking
+"""
+from __future__ import annotations
+
+import random
+import statistics
+import time
+from typing import Callable, List
+
+from app.catalog import Catalog
+from app.models import Exercise, Routine, RoutineExercise
+from app.ranking import RoutineColumns
+from app.search import _rank_candidates, build_results
+
+OBJECTIVES = ["fuerza", "hipertrofia", "resistencia", "movilidad", "salud", "mixto"]
+SECTIONS = ("warmup", "main", "main", "cooldown")
+REQUESTS = [
+    {"objectives": ["fuerza"], "session_minutes": 45},
+    {"objectives": ["fuerza", "hipertrofia"], "session_minutes": 60, "pathologies": ["lumbar"]},
+    {"objectives": ["salud", "movilidad", "resistencia"], "session_minutes": None},
+]
+
+
+def synthetic_catalog(size: int, seed: int = 3) -> Catalog:
+    rng = random.Random(seed)
+    exercises = [
+        Exercise(
+            id=index + 1,
+            name=f"Ejercicio {index}",
+            pattern=rng.choice(["empuje", "tiron", "core", "pierna_cadera"]),
+            sets=3,
+            reps="8-10",
+            minutes=rng.choice([None, 5, 10]),
+            contraindications=rng.choice([[], [], ["lumbar"], ["hombro"]]),
+        )
+        for index in range(60)
+    ]
+    routines: List[Routine] = []
+    links: List[RoutineExercise] = []
+    for index in range(size):
+        routine_id = index + 1
+        routines.append(
+            Routine(
+                id=routine_id,
+                name=f"Rutina {rng.randrange(size * 10):07d}-{index}",
+                objective=rng.choice(OBJECTIVES),
+                session_minutes=rng.randrange(20, 95, 5),
+                level="medio",
+                tags=[],
+            )
+        )
+        for order, section in enumerate(SECTIONS, start=1):
+            links.append(
+                RoutineExercise(
+                    routine_id=routine_id,
+                    exercise_id=rng.randrange(1, len(exercises) + 1),
+                    section=section,
+                    order_index=order,
+                )
+            )
+    return Catalog(version=1, routines=routines, exercises=exercises, links=links)
+
+
+def timed(func: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run(size: int, repeat: int) -> None:
+    catalog = synthetic_catalog(size)
+    columns = catalog.columns or RoutineColumns(catalog.routines)
+    scores = {routine_id: 1.0 for routine_id in range(1, size + 1, 97)}
+    print(f"\n== {size} rutinas (mediana de {repeat} repeticiones, ms) ==")
+    print(f"{'petición':<44}{'py todo':>10}{'py top20':>10}{'np top20':>10}{'rank py':>10}{'rank np':>10}")
+    for request in REQUESTS:
+        label = "+".join(request["objectives"]) + f" {request['session_minutes']}"
+        catalog.columns = None
+        full_python = timed(lambda: build_results(**request, catalog=catalog), repeat)
+        top_python = timed(lambda: build_results(**request, limit=20, catalog=catalog), repeat)
+        rank_python = timed(
+            lambda: _rank_candidates(catalog, request["objectives"], request["session_minutes"], scores, 20),
+            repeat,
+        )
+        catalog.columns = columns
+        top_numpy = timed(lambda: build_results(**request, limit=20, catalog=catalog), repeat)
+        rank_numpy = timed(
+            lambda: columns.rank(request["objectives"], request["session_minutes"], scores, 20),
+            repeat,
+        )
+        print(
+            f"{label:<44}{full_python:>10.2f}{top_python:>10.2f}{top_numpy:>10.2f}"
+            f"{rank_python:>10.2f}{rank_numpy:>10.2f}"
+        )
+
+
+def main() -> None:
+    run(10_000, repeat=15)
+    run(100_000, repeat=5)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,36 @@ document.addEventListener("DOMContentLoaded", () => {
   const spinner = document.getElementById("spinner");
   const minutesInput = document.getElementById("session_minutes");
   const minutesValue = document.getElementById("minutes-value");
+  // Con el gimnasio en la ruta (/t/<gimnasio>/) la API cuelga del mismo prefijo.
+  const apiBase = (window.location.pathname.match(/^\/t\/[^/]+/) || [""])[0];
+  // Paginas de una respuesta parcial que se piden como mucho por busqueda.
+  const MAX_RESULT_PAGES = 10;
 
   minutesValue.textContent = minutesInput.value;
   minutesInput.addEventListener("input", () => {
     minutesValue.textContent = minutesInput.value;
   });
 
+  // Planes populares embebidos en la portada: se pintan sin llamar a la API.
+  renderInitialPlans();
+
+  function renderInitialPlans() {
+    const script = document.getElementById("initial-data");
+    if (!script) return;
+    let initialData = null;
+    try {
+      initialData = JSON.parse(script.textContent);
+    } catch (error) {
+      return;
+    }
+    const results = (initialData?.popular || [])
+      .map((plan) => plan.results?.[0])
+      .filter(Boolean);
+    if (results.length) {
+      renderResults({ results });
+    }
+  }
+
   form.addEventListener("submit", async (event) => {
     event.preventDefault();
     clearError();
@@ -19,20 +43,22 @@ document.addEventListener("DOMContentLoaded", () => {
 
     try {
       const payload = buildPayload(form);
-      const response = await fetch("/api/search", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
-      });
-
-      if (!response.ok) {
-        const data = await response.json().catch(() => ({}));
-        const detail = data?.detail || "No se pudo completar la busqueda.";
-        throw new Error(detail);
-      }
-
-      const data = await response.json();
+      let data = await fetchResults(payload);
       renderResults(data);
+      // Respuesta parcial (presupuesto de tiempo agotado): se piden las
+      // paginas siguientes con el cursor y se van anadiendo, con un tope
+      // para no lanzar una peticion por rutina si el servidor va justo.
+      let pages = 1;
+      while (data.partial && data.next_cursor && pages < MAX_RESULT_PAGES) {
+        data = await fetchResults({ ...payload, cursor: data.next_cursor });
+        pages += 1;
+        if (data.results?.length) {
+          renderResults(data);
+        }
+      }
+      if (data.partial) {
+        showError("Resultados incompletos: el servidor va cargado, repite la busqueda para ver el resto.");
+      }
     } catch (error) {
       showError(error.message);
     } finally {
@@ -40,6 +66,26 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   });
 
+  async function fetchResults(payload) {
+    const response = await fetch(`${apiBase}/api/search`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(payload),
+    });
+
+    if (response.status === 409) {
+      // El catalogo cambio entre paginas: el cursor ya no vale.
+      throw new Error("El catalogo se ha actualizado; repite la busqueda.");
+    }
+    if (!response.ok) {
+      const data = await response.json().catch(() => ({}));
+      const detail = data?.detail || "No se pudo completar la busqueda.";
+      throw new Error(detail);
+    }
+
+    return response.json();
+  }
+
   function buildPayload(formElement) {
     const formData = new FormData(formElement);
 
@@ -178,6 +224,13 @@ document.addEventListener("DOMContentLoaded", () => {
       wrapper.appendChild(notes);
     }
 
+    if (item.substitutes?.name) {
+      const swap = document.createElement("p");
+      swap.textContent = `Sustituye a ${item.substitutes.name}`;
+      swap.className = "text-xs uppercase tracking-wide text-neutral-500 mt-2";
+      wrapper.appendChild(swap);
+    }
+
     // --- NUEVO: chips de contraindicaciones ---
     let contras = item.contraindications;
     if (typeof contras === "string") {
@@ -0,0 +1,19 @@
+import pytest
+
+from app import db
+from app.seed import provision_tenant
+from app.tenants import use_tenant
+
+
+@pytest.fixture
+def seeded_db(tmp_path, monkeypatch):
+    # Catálogo de seed en una base propia (tmp_path): no depende del fichero
+    # del repo ni del orden de los tests. Devuelve el tenant, para las
+    # peticiones HTTP (cabecera X-Athletica-Tenant o prefijo /t/<tenant>).
+    monkeypatch.setattr(db, "TENANTS_DIR", tmp_path)
+    provision_tenant("pruebas")
+    try:
+        with use_tenant("pruebas"):
+            yield "pruebas"
+    finally:
+        db.tenant_registry.close("pruebas")
@@ -0,0 +1,111 @@
+from fastapi.testclient import TestClient
+
+from app.auth import ADMIN_TOKEN_ENV
+from app.catalog import catalog_stats, get_catalog
+from app.main import app
+
+TOKEN = "test-admin-token"
+HEADERS = {"X-Admin-Token": TOKEN}
+
+
+def _client(tenant):
+    # Todas las peticiones van al tenant desechable de seeded_db, nunca a la
+    # base del repo.
+    return TestClient(app, headers={"X-Athletica-Tenant": tenant})
+
+
+def _search_names(client, q):
+    response = client.post(
+        "/api/search", json={"objectives": ["movilidad"], "session_minutes": 45, "q": q}
+    )
+    assert response.status_code == 200
+    return [item["name"] for item in response.json()["results"]]
+
+
+def test_admin_requires_token(monkeypatch, seeded_db):
+    monkeypatch.setenv(ADMIN_TOKEN_ENV, TOKEN)
+    with _client(seeded_db) as client:
+        payload = {"name": "X", "pattern": "core"}
+        assert client.post("/api/admin/exercises", json=payload).status_code == 403
+        assert (
+            client.post(
+                "/api/admin/exercises", json=payload, headers={"X-Admin-Token": "otro"}
+            ).status_code
+            == 403
+        )
+        assert client.delete("/api/admin/links/999999", headers=HEADERS).status_code == 404
+        assert client.get("/api/admin/stats").status_code == 403
+
+
+def test_admin_stats_report_search_coalescing(monkeypatch, seeded_db):
+    monkeypatch.setenv(ADMIN_TOKEN_ENV, TOKEN)
+    with _client(seeded_db) as client:
+        _search_names(client, None)
+        stats = client.get("/api/admin/stats", headers=HEADERS).json()
+        coalescing = stats["search_coalescing"]
+        assert coalescing["calls"] >= 1
+        assert coalescing["in_flight"] == 0
+        assert 0.0 <= coalescing["dedup_ratio"] <= 1.0
+        assert {"full_loads", "delta_loads"} <= set(stats["catalog"])
+
+
+def test_admin_writes_update_catalog_incrementally(monkeypatch, seeded_db):
+    monkeypatch.setenv(ADMIN_TOKEN_ENV, TOKEN)
+    with _client(seeded_db) as client:
+        get_catalog()
+        full_loads = catalog_stats["full_loads"]
+
+        exercise = client.post(
+            "/api/admin/exercises",
+            json={"name": "Rotacion toracica zumbona", "pattern": "movilidad", "minutes": 4},
+            headers=HEADERS,
+        )
+        assert exercise.status_code == 201
+        exercise_id = exercise.json()["item"]["id"]
+
+        routine = client.post(
+            "/api/admin/routines",
+            json={"name": "Movilidad zumbona", "objective": "movilidad", "session_minutes": 45},
+            headers=HEADERS,
+        )
+        assert routine.status_code == 201
+        routine_id = routine.json()["item"]["id"]
+        link = client.post(
+            f"/api/admin/routines/{routine_id}/exercises",
+            json={"exercise_id": exercise_id, "section": "main", "order_index": 0},
+            headers=HEADERS,
+        )
+        assert link.status_code == 201
+        link_id = link.json()["item"]["id"]
+        version = link.json()["catalog_version"]
+
+        try:
+            catalog = get_catalog()
+            assert catalog.version == version
+            assert [row[1].id for row in catalog.links_for(routine_id)] == [exercise_id]
+            assert _search_names(client, "zumbona")[0] == "Movilidad zumbona"
+            suggestions = client.get("/api/exercises/suggest", params={"q": "zumbona"}).json()
+            assert suggestions["suggestions"][0]["exercise_id"] == exercise_id
+
+            renamed = client.put(
+                f"/api/admin/exercises/{exercise_id}",
+                json={"name": "Rotacion toracica zambomba", "pattern": "movilidad"},
+                headers=HEADERS,
+            )
+            assert renamed.status_code == 200
+            assert get_catalog().exercises[exercise_id].name == "Rotacion toracica zambomba"
+            assert _search_names(client, "zambomba")[0] == "Movilidad zumbona"
+            # Ninguna escritura ha obligado a recargar el catálogo entero.
+            assert catalog_stats["full_loads"] == full_loads
+        finally:
+            # Borrar el ejercicio arrastra sus enlaces.
+            deleted = client.delete(f"/api/admin/exercises/{exercise_id}", headers=HEADERS)
+            client.delete(f"/api/admin/routines/{routine_id}", headers=HEADERS)
+
+        assert deleted.json()["item"]["deleted_links"] == 1
+        assert client.delete(f"/api/admin/links/{link_id}", headers=HEADERS).status_code == 404
+
+        assert routine_id not in get_catalog().routines_by_id
+        assert exercise_id not in get_catalog().exercises
+        assert "Movilidad zumbona" not in _search_names(client, "zambomba")
+        assert catalog_stats["full_loads"] == full_loads
@@ -0,0 +1,59 @@
+import shutil
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.assets import (
+    IMMUTABLE_CACHE_CONTROL,
+    STATIC_DIR,
+    CachedStaticFiles,
+    build_assets,
+    static_url_for,
+)
+from app.main import app
+
+
+def test_build_assets_serves_hashed_precompressed_files(tmp_path):
+    static_dir = tmp_path / "static"
+    shutil.copytree(STATIC_DIR, static_dir, ignore=shutil.ignore_patterns("dist"))
+
+    manifest = build_assets(static_dir)
+    hashed_js = manifest["js/app.js"]
+    assert hashed_js.startswith("dist/js/app.") and hashed_js.endswith(".js")
+    assert static_url_for(manifest)("js/app.js") == f"/static/{hashed_js}"
+
+    static_app = FastAPI()
+    static_app.mount("/static", CachedStaticFiles(directory=str(static_dir)))
+    original = (static_dir / "js" / "app.js").read_bytes()
+
+    with TestClient(static_app) as client:
+        response = client.get(
+            f"/static/{hashed_js}", headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert "javascript" in response.headers["content-type"]
+        assert response.content == original
+
+        identity = client.get(
+            f"/static/{hashed_js}", headers={"Accept-Encoding": "identity"}
+        )
+        assert "content-encoding" not in identity.headers
+        assert identity.content == original
+
+        raw = client.get("/static/js/app.js", headers={"Accept-Encoding": "identity"})
+        assert raw.headers["cache-control"] != IMMUTABLE_CACHE_CONTROL
+
+
+def test_large_search_responses_are_gzipped():
+    payload = {"objectives": ["fuerza", "hipertrofia"], "session_minutes": 60}
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/search", json=payload, headers={"Accept-Encoding": "gzip"}
+        )
+        index = client.get("/")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["ok"] is True
+    assert "/static/" in index.text
@@ -0,0 +1,41 @@
+import io
+import json
+
+from app.cli import run_plan
+from app.db import init_db
+
+
+def test_plan_command_reads_jsonl_and_csv(tmp_path):
+    init_db()
+    jsonl = tmp_path / "profiles.jsonl"
+    jsonl.write_text(
+        "\n".join(
+            [
+                json.dumps({"id": "c1", "objective": "fuerza", "session_minutes": 45}),
+                json.dumps({"id": "c2", "objectives": ["salud"], "pathologies": ["gripe"]}),
+                "{no es json",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    csv_path = tmp_path / "profiles.csv"
+    csv_path.write_text(
+        "id,objectives,session_minutes,pathologies,level\n"
+        "c3,fuerza;hipertrofia,60,hombro;lumbar,avanzado\n",
+        encoding="utf-8",
+    )
+
+    output = io.StringIO()
+    stats = run_plan(jsonl, output, workers=1)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert stats == {"profiles": 3, "ok": 1, "errors": 2}
+    assert [record["line"] for record in records] == [1, 2, 3]
+    assert records[0]["id"] == "c1" and records[0]["results"]
+    assert "gripe" in records[1]["error"]
+
+    output = io.StringIO()
+    stats = run_plan(csv_path, output, workers=2, chunk_size=1)
+    record = json.loads(output.getvalue())
+    assert stats["ok"] == 1
+    assert record["request"]["pathologies"] == ["hombro", "lumbar"]
+    assert record["results"][0]["level"] == "avanzado"
@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+from app import db
+from app.memory_db import SERVING_MODE_ENV, MemoryReplica
+from app.search import build_results
+from app.seed import provision_tenant
+from app.tenants import use_tenant
+
+
+def _fts_exercises(engine, query):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            "SELECT rowid FROM exercise_fts WHERE exercise_fts MATCH ?;",
+            (query,),
+        ).fetchall()
+    return sorted(row[0] for row in rows)
+
+
+@pytest.fixture
+def catalog_db(tmp_path, monkeypatch):
+    # Base propia con el catálogo de seed: no depende del fichero del repo
+    # ni de que otro test lo haya migrado antes.
+    monkeypatch.setattr(db, "TENANTS_DIR", tmp_path)
+    provision_tenant("catalogo")
+    db.tenant_registry.close("catalogo")
+    return db.tenant_db_path("catalogo")
+
+
+def test_replica_serves_fts_read_only_and_reloads(catalog_db):
+    source = catalog_db
+    replica = MemoryReplica(source, reload_seconds=3600)
+    try:
+        disk = create_engine(f"sqlite:///{source}")
+        assert _fts_exercises(replica.engine(), "press") == _fts_exercises(disk, "press") != []
+        assert replica.estimated_bytes() > 0
+
+        with pytest.raises(OperationalError):
+            with replica.engine().begin() as conn:
+                conn.exec_driver_sql("DELETE FROM routine;")
+
+        assert replica.reload_if_changed() is False
+        with disk.begin() as conn:
+            conn.exec_driver_sql("UPDATE catalog_state SET version = version + 1;")
+        previous = replica.version
+        assert replica.reload_if_changed() is True
+        assert replica.version == previous + 1 and replica.reloads == 1
+        disk.dispose()
+    finally:
+        replica.close()
+
+
+def test_reload_keeps_the_previous_copy_until_the_next_one(catalog_db):
+    replica = MemoryReplica(catalog_db, reload_seconds=3600)
+    try:
+        # Engine obtenido justo antes de la recarga: sigue viendo el catálogo.
+        engine = replica.engine()
+        replica.reload()
+        assert _fts_exercises(engine, "press") == _fts_exercises(replica.engine(), "press") != []
+
+        replica.reload()
+        assert _fts_exercises(replica.engine(), "press") != []
+    finally:
+        replica.close()
+
+
+def test_memory_mode_routes_tenant_reads_to_replica(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "TENANTS_DIR", tmp_path)
+    monkeypatch.setenv(SERVING_MODE_ENV, "memory")
+    provision_tenant("gym-memoria")
+    try:
+        with use_tenant("gym-memoria"):
+            engine = db.get_read_engine()
+            assert engine.url.database is None  # sqlite:// en memoria
+            assert db.get_engine().url.database.endswith("gym-memoria.db")
+            with Session(engine) as session:
+                assert db.get_catalog_version(session) == db.get_catalog_version()
+            assert build_results(["fuerza"], 45, q="press")["results"]
+            replica = db.tenant_cache()[db.READ_REPLICA_KEY]
+    finally:
+        db.tenant_registry.close("gym-memoria")
+    # Cerrar el tenant libera también su copia en memoria.
+    with pytest.raises(Exception):
+        replica._keeper.execute("SELECT 1;")
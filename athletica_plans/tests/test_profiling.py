@@ -0,0 +1,89 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.catalog import get_catalog
+from app.main import app
+from app.auth import is_admin_token
+from app.profiling import QueryPlanRegression, audit_queries, profile_call
+from app.search import build_results
+
+REPRESENTATIVE_SEARCHES = [
+    {"objectives": ["fuerza"], "session_minutes": 45},
+    {"objectives": ["fuerza", "hipertrofia"], "session_minutes": 60, "pathologies": ["hombro"]},
+    {"objectives": ["salud"], "level": "principiante", "q": "remo mancuernas"},
+]
+
+
+def test_search_query_plans_do_not_scan():
+    with TestClient(app):
+        get_catalog()  # la carga del catálogo recorre las tablas a propósito
+        with audit_queries(strict=True) as audit:
+            for params in REPRESENTATIVE_SEARCHES:
+                build_results(**params)
+    assert audit.statements
+    assert all("plan" in entry for entry in audit.statements)
+
+
+def test_strict_audit_flags_full_scans():
+    from app.db import get_session
+
+    with TestClient(app):
+        with pytest.raises(QueryPlanRegression):
+            with audit_queries(strict=True):
+                with get_session() as session:
+                    session.connection().exec_driver_sql(
+                        "SELECT * FROM routine WHERE tags LIKE '%fuerza%' ORDER BY tags"
+                    ).fetchall()
+
+
+def test_strict_audit_resolves_aliases_and_full_index_scans():
+    from app.db import get_session
+
+    statements = [
+        # SQLite muestra 'SCAN re', no el nombre de la tabla.
+        "SELECT re.* FROM routineexercise AS re WHERE re.order_index + re.exercise_id > 0",
+        # Recorre todo el índice: sigue siendo un recorrido completo.
+        "SELECT re.routine_id FROM routineexercise re",
+    ]
+    with TestClient(app):
+        for statement in statements:
+            with pytest.raises(QueryPlanRegression, match="full table scan on routineexercise"):
+                with audit_queries(strict=True):
+                    with get_session() as session:
+                        session.connection().exec_driver_sql(statement).fetchall()
+
+
+def test_profile_header_requires_admin_token(monkeypatch):
+    payload = {"objective": "fuerza", "session_minutes": 45}
+    monkeypatch.setenv("ATHLETICA_ADMIN_TOKEN", "secreto")
+    with TestClient(app) as client:
+        plain = client.post("/api/search", json=payload, headers={"X-Athletica-Profile": "otro"})
+        profiled = client.post(
+            "/api/search", json=payload, headers={"X-Athletica-Profile": "secreto"}
+        )
+
+    assert "profile" not in plain.json()
+    report = profiled.json()["profile"]
+    assert report["functions"]
+    assert report["sql"]["issues"] == []
+
+
+def test_concurrent_profile_returns_result_without_report():
+    # Mientras un perfilado está en curso, el segundo no activa otro cProfile.
+    (inner_result, inner_report), outer_report = profile_call(lambda: profile_call(lambda: 42))
+    assert inner_result == 42 and inner_report is None
+    assert outer_report is not None and outer_report["functions"]
+
+
+def test_non_ascii_admin_token_is_rejected_not_an_error(monkeypatch):
+    monkeypatch.setenv("ATHLETICA_ADMIN_TOKEN", "secreto")
+    assert is_admin_token("señor") is False
+    assert is_admin_token("secreto") is True
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/search",
+            json={"objective": "fuerza"},
+            headers={"X-Athletica-Profile": "señor".encode("latin-1")},
+        )
+    assert response.status_code == 200
+    assert "profile" not in response.json()
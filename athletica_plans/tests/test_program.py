@@ -0,0 +1,66 @@
+from fastapi.testclient import TestClient
+
+from app.catalog import Catalog, get_catalog
+from app.main import app
+from app.program import build_program
+
+
+def test_program_balances_week_without_contraindicated_exercises():
+    payload = {
+        "days_per_week": 6,
+        "objectives": ["fuerza", "hipertrofia", "salud"],
+        "session_minutes": 50,
+        "pathologies": ["lumbar"],
+        "level": "medio",
+    }
+    with TestClient(app) as client:
+        response = client.post("/api/program", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    days = data["days"]
+    assert [day["day"] for day in days] == [1, 2, 3, 4, 5, 6]
+    assert [day["objective"] for day in days[:3]] == ["fuerza", "hipertrofia", "salud"]
+
+    names_by_day = []
+    for day in days:
+        assert set(day["sections"]) == {"warmup", "main", "cooldown"}
+        items = day["sections"]["main"]["items"]
+        assert items
+        ids = [item["exercise_id"] for item in items]
+        assert len(ids) == len(set(ids)), "No se repiten ejercicios en un mismo día"
+        for item in items:
+            assert "lumbar" not in item["contraindications"]
+        names_by_day.append(ids)
+
+    # Antes de repetir se agotan los ejercicios seguros disponibles
+    # (press, remo, goblet, sentadilla y plancha en el catálogo semilla).
+    assert len(set().union(*names_by_day[:2])) == 5
+    assert sum(data["pattern_counts"].values()) == sum(len(ids) for ids in names_by_day)
+
+
+def test_program_rejects_invalid_days():
+    with TestClient(app) as client:
+        response = client.post("/api/program", json={"objective": "fuerza", "days_per_week": 9})
+    assert response.status_code == 422
+
+
+def test_program_rejects_search_only_fields():
+    with TestClient(app) as client:
+        for extra in ({"q": "press"}, {"limit": 2}, {"cursor": "1.0"}):
+            response = client.post("/api/program", json={"objective": "fuerza", **extra})
+            assert response.status_code == 422, extra
+
+
+def test_program_numbers_only_emitted_days(seeded_db):
+    seed = get_catalog()
+    # 'salud' sin rutinas: sus días se saltan sin dejar huecos en la numeración.
+    catalog = Catalog(
+        version=seed.version,
+        routines=[routine for routine in seed.routines if routine.objective != "salud"],
+        exercises=list(seed.exercises.values()),
+        links=list(seed.links.values()),
+    )
+    data = build_program(days_per_week=5, objectives=["fuerza", "salud"], catalog=catalog)
+    assert [day["day"] for day in data["days"]] == [1, 2, 3]
+    assert {day["objective"] for day in data["days"]} == {"fuerza"}
@@ -0,0 +1,128 @@
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import query_log, warmup
+from app.cli import main
+from app.main import app
+from app.query_log import QUERY_LOG_ENV, QueryLog, close_query_log, get_query_log, top_requests
+from app.search import search_key
+
+FUERZA = {"objectives": ["fuerza"], "session_minutes": 45, "pathologies": [], "level": "medio", "q": None, "limit": None}
+SALUD = {**FUERZA, "objectives": ["salud"]}
+
+
+@pytest.fixture
+def fresh_query_log():
+    # El registro global no sobrevive entre tests: ni un escritor de otra
+    # ruta ni sus contadores.
+    close_query_log()
+    query_log._query_log = None
+    yield
+    close_query_log()
+    query_log._query_log = None
+
+
+def test_batched_writer_and_top_requests(tmp_path):
+    path = tmp_path / "log.db"
+    log = QueryLog(path, batch_size=3, flush_seconds=0.05)
+    for _ in range(5):
+        log.record("default", search_key(**FUERZA), 2.0, 4)
+    log.record("default", search_key(**SALUD), 8.0, 1)
+    log.record("gym-norte", search_key(**SALUD), 1.0, 2)
+    log.close()
+
+    assert log.stats()["written"] == 7 and log.stats()["dropped"] == 0
+    top = top_requests(path, limit=5, tenant="default")
+    assert [entry["request"] for entry in top] == [FUERZA, SALUD]
+    assert top[0]["count"] == 5 and top[0]["avg_results"] == 4
+    assert len(top_requests(path)) == 3
+    assert top_requests(tmp_path / "missing.db") == []
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    log = QueryLog(tmp_path / "log.db", max_queue=1, flush_seconds=0.05)
+    for _ in range(500):
+        log.record("default", search_key(**FUERZA), 1.0, 1)
+    log.close()
+    stats = log.stats()
+    assert stats["recorded"] + stats["dropped"] == 500
+    assert stats["written"] == stats["recorded"]
+
+
+def test_unwritable_log_is_disabled_and_close_does_not_hang(tmp_path):
+    blocker = tmp_path / "fichero"
+    blocker.write_text("")
+    # El directorio padre es un fichero: el escritor no puede abrir la base.
+    log = QueryLog(blocker / "log.db", max_queue=2, flush_seconds=0.05)
+    log.record("default", search_key(**FUERZA), 1.0, 1)
+    deadline = time.monotonic() + 5
+    while not log.dead and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for _ in range(10):
+        log.record("default", search_key(**FUERZA), 1.0, 1)
+
+    started = time.monotonic()
+    log.close(timeout=1)
+    assert time.monotonic() - started < 2
+    stats = log.stats()
+    assert stats["dead"] and stats["errors"] == 1 and stats["last_error"]
+    assert stats["written"] == 0 and stats["dropped"] == 11
+
+
+def test_close_returns_when_writer_died_with_a_full_queue(tmp_path, monkeypatch):
+    path = tmp_path / "log.db"
+    opening, release = threading.Event(), threading.Event()
+    connect = sqlite3.connect
+
+    def failing_connect(database, *args, **kwargs):
+        if database != str(path):
+            return connect(database, *args, **kwargs)
+        # El escritor se queda atascado al abrir la base y acaba fallando.
+        opening.set()
+        release.wait(5)
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(sqlite3, "connect", failing_connect)
+    log = QueryLog(path, max_queue=3)
+    for _ in range(5):
+        log.record("default", search_key(**FUERZA), 1.0, 1)
+    assert opening.wait(5)
+
+    # Cola llena y escritor sin consumir: close() no puede encolar el fin.
+    started = time.monotonic()
+    log.close(timeout=0.2)
+    assert time.monotonic() - started < 1
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while log.stats()["dropped"] < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = log.stats()
+    assert stats["dead"] and stats["errors"] == 1
+    assert stats["written"] == 0 and stats["recorded"] == 0 and stats["dropped"] == 5
+
+
+def test_searches_are_logged_and_feed_warmup(
+    seeded_db, fresh_query_log, tmp_path, monkeypatch, capsys
+):
+    path = tmp_path / "log.db"
+    monkeypatch.setenv(QUERY_LOG_ENV, str(path))
+    body = {"objectives": ["resistencia"], "session_minutes": 30, "q": "comba"}
+    with TestClient(app, headers={"X-Athletica-Tenant": seeded_db}) as client:
+        for _ in range(3):
+            assert client.post("/api/search", json=body).status_code == 200
+        assert client.get("/api/search", params=body).status_code == 200
+    close_query_log()
+    assert get_query_log().stats()["written"] >= 4
+
+    expected = {**FUERZA, "objectives": ["resistencia"], "session_minutes": 30, "q": "comba"}
+    assert warmup.warmup_requests()[0] == expected
+
+    assert main(["top-queries", "-n", "1", "--tenant", seeded_db]) == 0
+    line = json.loads(capsys.readouterr().out.strip())
+    assert line["objectives"] == ["resistencia"] and line["count"] == 4
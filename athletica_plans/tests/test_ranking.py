@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from app.catalog import Catalog
+from app.models import Routine
+from app.ranking import VECTORIZE_MIN_ROUTINES
+from app.search import _rank_candidates
+
+pytest.importorskip("numpy")
+
+OBJECTIVES = ["fuerza", "hipertrofia", "resistencia", "movilidad", "salud", "mixto"]
+
+
+def _synthetic_catalog(size):
+    rng = random.Random(7)
+    routines = [
+        Routine(
+            id=index + 1,
+            name=f"Rutina {rng.randrange(size * 10):07d}-{index}",
+            objective=rng.choice(OBJECTIVES),
+            session_minutes=rng.randrange(20, 95, 5),
+            level="medio",
+            tags=[],
+        )
+        for index in range(size)
+    ]
+    return Catalog(version=1, routines=routines, exercises=[], links=[])
+
+
+def test_vectorized_ranking_matches_python_path():
+    catalog = _synthetic_catalog(VECTORIZE_MIN_ROUTINES + 500)
+    assert catalog.columns is not None
+    rng = random.Random(11)
+
+    for _ in range(40):
+        objectives = rng.sample(OBJECTIVES[:-1], rng.randint(1, 3))
+        minutes = rng.choice([None, 30, 45, 60, 200])
+        scores = {rng.randrange(1, len(catalog.routines)): float(rng.randint(1, 4)) for _ in range(30)}
+        limit = rng.choice([None, 1, 10, 50])
+
+        vectorized = catalog.columns.rank(objectives, minutes, scores, limit)
+        columns, catalog.columns = catalog.columns, None
+        try:
+            expected = _rank_candidates(catalog, objectives, minutes, scores, limit)
+        finally:
+            catalog.columns = columns
+
+        assert [routine.id for routine, _ in vectorized[0]] == [
+            routine.id for routine, _ in expected[0]
+        ]
+        assert [score for _, score in vectorized[0]] == [score for _, score in expected[0]]
+        assert vectorized[1] == expected[1]
+
+
+def test_has_mixto_only_counts_the_selected_rows():
+    catalog = _synthetic_catalog(VECTORIZE_MIN_ROUTINES + 500)
+    for limit in (1, 3, None):
+        for use_columns in (True, False):
+            columns = catalog.columns
+            if not use_columns:
+                catalog.columns = None
+            try:
+                ranked, has_mixto = _rank_candidates(catalog, ["fuerza", "salud"], 45, {}, limit)
+            finally:
+                catalog.columns = columns
+            # Hay 'mixto' entre los candidatos, pero solo cuenta si entra en el top-k.
+            assert has_mixto == any(routine.objective == "mixto" for routine, _ in ranked)
+    assert _rank_candidates(catalog, ["fuerza", "salud"], 45, {}, None)[1] is True
+    assert _rank_candidates(catalog, ["fuerza", "salud"], 45, {}, 1)[1] is False
@@ -1,6 +1,11 @@
+import pytest
 from fastapi.testclient import TestClient
 
+from app.catalog import Catalog, get_catalog
+from app.db import get_session
 from app.main import app
+from app.models import Exercise
+from app.search import SEARCH_BUDGET_ENV, StaleCursorError, _match_fts, build_results
 
 
 def test_search_filters_contraindications():
@@ -54,3 +59,161 @@ def test_search_combo_objectives_and_level():
     assert "warmup" in first["sections"]
     assert "main" in first["sections"]
     assert "cooldown" in first["sections"]
+
+
+def test_search_get_supports_conditional_requests():
+    params = {
+        "objectives": ["fuerza", "hipertrofia"],
+        "session_minutes": 60,
+        "pathologies": ["hombro"],
+        "q": "remo",
+    }
+    with TestClient(app) as client:
+        response = client.get("/api/search", params=params)
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        assert response.json()["results"]
+
+        cached = client.get("/api/search", params=params, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag
+
+        changed = client.get(
+            "/api/search",
+            params={**params, "level": "avanzado"},
+            headers={"If-None-Match": etag},
+        )
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+
+        static = client.get("/static/js/app.js")
+        assert static.headers["cache-control"]
+
+
+def test_index_is_prerendered_with_choices_and_popular_plans():
+    with TestClient(app) as client:
+        response = client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        etag = response.headers["etag"]
+
+        html = response.text
+        for value in ("fuerza", "salud", "rodilla", "avanzado"):
+            assert f'value="{value}"' in html
+        assert 'id="initial-data"' in html
+        assert '"popular"' in html
+
+        cached = client.get(
+            "/", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+        )
+        assert cached.status_code == 304
+
+
+def test_excluded_exercises_are_swapped_for_same_pattern_alternatives():
+    base = {"objective": "hipertrofia", "session_minutes": 45, "level": "medio"}
+    with TestClient(app) as client:
+        plain = client.post("/api/search", json=base).json()
+        safe = client.post("/api/search", json={**base, "pathologies": ["lumbar"]}).json()
+
+    plain_main = plain["results"][0]["sections"]["main"]["items"]
+    safe_main = safe["results"][0]["sections"]["main"]["items"]
+    assert len(safe_main) == len(plain_main)
+
+    swapped = [item for item in safe_main if item.get("substitutes")]
+    assert swapped
+    for item in swapped:
+        assert "lumbar" not in item["contraindications"]
+        original = next(
+            entry for entry in plain_main
+            if entry["exercise_id"] == item["substitutes"]["exercise_id"]
+        )
+        assert original["pattern"] == item["pattern"]
+
+
+def test_fts_terms_match_routine_or_exercise_of_each_link(seeded_db):
+    with get_session() as session:
+        press = _match_fts(session, "press")
+        strength = _match_fts(session, "fuerza")
+        both = _match_fts(session, "fuerza press")
+        # Cada término puede casar en la rutina ('fuerza') o en el ejercicio
+        # ('press') del mismo enlace; solo puntúan los enlaces que casan ambos.
+        assert both and set(both) == set(press) & set(strength)
+        assert all(both[routine_id] <= press[routine_id] for routine_id in both)
+        assert _match_fts(session, "fuerza OR press").keys() == press.keys() | strength.keys()
+        assert _match_fts(session, "press (") == {}
+
+
+def test_fts_column_filters_go_to_the_table_that_has_the_column(seeded_db):
+    with get_session() as session:
+        for query in ("pattern:empuje", "tags:fuerza", "notes:espalda"):
+            assert _match_fts(session, query), query
+        # Nombres de columna del antiguo índice por enlace.
+        assert _match_fts(session, "exercise_name:press") == _match_fts(session, "press")
+        assert _match_fts(session, "routine_name:fuerza").keys() <= _match_fts(session, "fuerza").keys()
+        assert _match_fts(session, "{routine_name exercise_name}:press") == _match_fts(session, "press")
+        # Términos con filtro de tablas distintas: cada uno en la suya.
+        both = _match_fts(session, "tags:fuerza pattern:empuje")
+        assert both and both.keys() <= _match_fts(session, "tags:fuerza").keys()
+        either = _match_fts(session, "tags:fuerza OR pattern:empuje")
+        assert either.keys() == _match_fts(session, "tags:fuerza").keys() | _match_fts(session, "pattern:empuje").keys()
+        assert _match_fts(session, "columna:press") == {}
+
+
+def test_time_budget_returns_partial_pages_that_add_up_to_the_full_result(seeded_db):
+    seed = get_catalog()
+    # Sin rutinas 'mixto' la búsqueda multi-objetivo compone el plan mixto.
+    catalog = Catalog(
+        version=seed.version,
+        routines=[routine for routine in seed.routines if routine.objective != "mixto"],
+        exercises=list(seed.exercises.values()),
+        links=list(seed.links.values()),
+    )
+    params = {"objectives": ["fuerza", "hipertrofia"], "session_minutes": 45, "catalog": catalog}
+    full = build_results(**params)
+    assert full["partial"] is False and full["next_cursor"] is None
+
+    # Presupuesto ya agotado: una rutina por página y el plan compuesto al final.
+    pages = [build_results(**params, budget_ms=1e-6)]
+    while pages[-1]["partial"]:
+        pages.append(build_results(**params, cursor=pages[-1]["next_cursor"], budget_ms=1e-6))
+    assert pages[0]["next_cursor"] == f"{seed.version}.1+mixto"
+    assert len(pages) == len(full["results"])
+    assert [item for page in pages for item in page["results"]] == full["results"][1:] + full["results"][:1]
+
+    # Un cambio del catálogo entre páginas invalida el cursor.
+    changed = catalog.patched(catalog.version + 1, routines={}, exercises={}, links={})
+    with pytest.raises(StaleCursorError):
+        build_results(**{**params, "catalog": changed}, cursor=pages[0]["next_cursor"])
+
+
+def test_partial_search_is_not_cached(monkeypatch):
+    monkeypatch.setenv(SEARCH_BUDGET_ENV, "0.000001")
+    params = {"objectives": ["fuerza", "hipertrofia"], "session_minutes": 45}
+    with TestClient(app) as client:
+        response = client.get("/api/search", params=params)
+        assert response.json()["partial"] is True
+        assert response.headers["cache-control"] == "no-store"
+        assert "etag" not in response.headers
+
+        following = client.post("/api/search", json={**params, "cursor": response.json()["next_cursor"]})
+        assert following.status_code == 200
+        assert client.post("/api/search", json={**params, "cursor": "x"}).status_code == 422
+        assert client.post("/api/search", json={**params, "cursor": "0.1"}).status_code == 409
+
+
+def test_substitution_index_does_not_grow_with_distinct_contraindications():
+    # 20 contraindicaciones distintas: el índice no debe enumerar sus 2^20
+    # combinaciones, solo las pedidas.
+    exercises = [
+        Exercise(id=index + 1, name=f"Press {index}", pattern="empuje", minutes=5,
+                 contraindications=[f"lesion{index}"] if index else ["hombro"])
+        for index in range(21)
+    ]
+    catalog = Catalog(version=1, routines=[], exercises=exercises, links=[])
+    assert len(catalog.pathology_bits) == 21
+    assert catalog.estimated_bytes() < 100_000
+
+    substitute = catalog.substitute_for(exercises[0], ["hombro", "lesion1"], taken=set())
+    assert substitute is not None and substitute.id not in (1, 2)
+    assert catalog.substitute_for(exercises[0], ["rodilla"], taken=set()) is None
+    assert len(catalog.substitutes) == 1
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.routers import search as search_router
+from app.singleflight import SingleFlight
+
+
+def _slow(counter, release, value="plan"):
+    counter.append(1)
+    release.wait(5)
+    return {"value": value}
+
+
+def test_threads_share_one_execution():
+    flights = SingleFlight()
+    calls, release = [], threading.Event()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(flights.do, "fuerza-45", _slow, calls, release) for _ in range(8)]
+        while flights.stats()["calls"] < 8:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    stats = flights.stats()
+    assert stats["executions"] == 1 and stats["shared"] == 7
+    assert stats["keys"]["fuerza-45"]["max_waiters"] == 8
+    assert flights.in_flight() == 0
+
+    # Terminado el cálculo no queda nada: la siguiente llamada ejecuta otra vez.
+    assert flights.do("fuerza-45", _slow, calls, release) == {"value": "plan"}
+    assert len(calls) == 2
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def boom():
+        release.wait(5)
+        raise ValueError("sin catálogo")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flights.do, "k", boom) for _ in range(4)]
+        while flights.stats()["calls"] < 4:
+            time.sleep(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="sin catálogo"):
+                future.result()
+    assert flights.in_flight() == 0
+
+
+def test_asyncio_tasks_and_threads_join_the_same_flight():
+    flights = SingleFlight()
+    calls, release = [], threading.Event()
+
+    async def main():
+        tasks = [asyncio.create_task(flights.do_async("k", _slow, calls, release)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        thread_result = asyncio.get_running_loop().run_in_executor(
+            None, flights.do, "k", _slow, calls, release
+        )
+        while flights.stats()["calls"] < 6:
+            await asyncio.sleep(0.01)
+        # Cancelar a un esperador no cancela el cálculo de los demás.
+        tasks[0].cancel()
+        release.set()
+        results = await asyncio.gather(*tasks[1:], thread_result)
+        return results
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flights.in_flight() == 0
+
+
+def test_coalesced_searches_get_equal_but_distinct_results(monkeypatch):
+    flights, calls, release = SingleFlight(), [], threading.Event()
+    monkeypatch.setattr(search_router, "search_flights", flights)
+    monkeypatch.setattr(
+        search_router, "build_results", lambda budget_ms=None, **params: _slow(calls, release)
+    )
+    params = {"objectives": ["fuerza"], "session_minutes": 45}
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(search_router.coalesced_results, params, 1) for _ in range(2)]
+        while flights.stats()["calls"] < 2:
+            time.sleep(0.01)
+        release.set()
+        first, second = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert first == second and first is not second
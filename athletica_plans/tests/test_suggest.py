@@ -0,0 +1,29 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def _suggest(client, q, **params):
+    response = client.get("/api/exercises/suggest", params={"q": q, **params})
+    assert response.status_code == 200
+    return [item["name"] for item in response.json()["suggestions"]]
+
+
+def test_suggest_handles_partial_and_misspelled_input():
+    with TestClient(app) as client:
+        assert _suggest(client, "mancu")[0] == "Remo con mancuerna"
+        assert _suggest(client, "sentadila")[0] == "Sentadilla profunda"
+        assert _suggest(client, "pr")[0] == "Press militar con barra"
+        assert _suggest(client, "zzzz") == []
+        assert len(_suggest(client, "a", limit=2)) <= 2
+        # Segunda llamada idéntica: servida desde la caché por prefijo.
+        assert _suggest(client, "mancu")[0] == "Remo con mancuerna"
+
+
+def test_suggest_validates_query():
+    with TestClient(app) as client:
+        assert client.get("/api/exercises/suggest", params={"q": ""}).status_code == 422
+        assert (
+            client.get("/api/exercises/suggest", params={"q": "remo", "limit": 500}).status_code
+            == 422
+        )
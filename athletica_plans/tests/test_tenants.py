@@ -0,0 +1,127 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from app import db
+from app.auth import ADMIN_TOKEN_ENV
+from app.main import app
+from app.seed import provision_tenant
+from app import tenants
+from app.tenants import DEFAULT_TENANT, TenantRegistry
+
+TOKEN = "test-admin-token"
+
+
+@pytest.fixture
+def gym(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "TENANTS_DIR", tmp_path)
+    provision_tenant("gym-norte")
+    yield "gym-norte"
+    db.tenant_registry.close("gym-norte")
+
+
+def _names(response):
+    assert response.status_code == 200
+    return [item["name"] for item in response.json()["results"]]
+
+
+def test_tenants_have_isolated_catalogs(gym, monkeypatch):
+    monkeypatch.setenv(ADMIN_TOKEN_ENV, TOKEN)
+    search = {"objectives": ["movilidad"], "session_minutes": 45, "q": "exclusiva"}
+    with TestClient(app) as client:
+        created = client.post(
+            "/api/admin/routines",
+            json={"name": "Movilidad exclusiva norte", "objective": "movilidad", "session_minutes": 45},
+            headers={"X-Admin-Token": TOKEN, "X-Athletica-Tenant": gym},
+        )
+        assert created.status_code == 201
+
+        by_header = client.post("/api/search", json=search, headers={"X-Athletica-Tenant": gym})
+        assert "Movilidad exclusiva norte" in _names(by_header)
+        assert "x-athletica-tenant" in by_header.headers["vary"].lower()
+
+        by_prefix = client.post(f"/t/{gym}/api/search", json=search)
+        assert "Movilidad exclusiva norte" in _names(by_prefix)
+        assert client.get(f"/t/{gym}/").status_code == 200
+
+        assert "Movilidad exclusiva norte" not in _names(client.post("/api/search", json=search))
+
+
+def test_unknown_or_invalid_tenant_is_rejected(gym):
+    with TestClient(app) as client:
+        payload = {"objectives": ["fuerza"]}
+        assert client.post("/t/gym-sur/api/search", json=payload).status_code == 404
+        assert (
+            client.post("/api/search", json=payload, headers={"X-Athletica-Tenant": "../x"}).status_code
+            == 400
+        )
+
+
+def test_registry_evicts_idle_and_over_budget_tenants():
+    disposed = []
+
+    def factory(tenant):
+        engine = create_engine("sqlite://")
+        original = engine.dispose
+        engine.dispose = lambda *args, **kwargs: (disposed.append(tenant), original(*args, **kwargs))
+        return engine
+
+    registry = TenantRegistry(factory, lambda tenant: True, max_bytes=10**12, idle_seconds=3600)
+    for tenant in (DEFAULT_TENANT, "a", "b"):
+        registry.slot(tenant)
+    assert registry.stats()["open"] == 3
+
+    # Presupuesto para dos tenants: sale el menos usado, nunca el por defecto.
+    registry.max_bytes = 2 * registry.slot("b").estimated_bytes()
+    registry.slot("c")
+    assert not registry.is_open("a") and not registry.is_open("b")
+    assert registry.is_open(DEFAULT_TENANT) and registry.is_open("c")
+    assert disposed == ["a", "b"]
+
+    registry.max_bytes = 10**12
+    registry.idle_seconds = 0
+    assert registry.evict_idle() == ["c"]
+    assert registry.is_open(DEFAULT_TENANT)
+
+
+def test_pinned_tenants_survive_eviction():
+    registry = TenantRegistry(
+        lambda tenant: create_engine("sqlite://"), lambda tenant: True, max_bytes=10**12, idle_seconds=0
+    )
+    registry.slot("a")
+    with registry.pinned("a"):
+        # Una petición en curso: ni por inactividad ni por presupuesto.
+        registry.max_bytes = 0
+        registry.slot("b")
+        assert registry.evict_idle() == ["b"]
+        assert registry.is_open("a")
+    assert registry.evict_idle() == ["a"]
+
+
+def test_idle_tenants_are_swept_after_responses(gym, monkeypatch):
+    monkeypatch.setattr(tenants, "SWEEP_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(db.tenant_registry, "idle_seconds", 0)
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/search", json={"objectives": ["fuerza"]}, headers={"X-Athletica-Tenant": gym}
+        )
+        assert response.status_code == 200
+        # Durante la petición estaba fijado; al terminar ya está inactivo.
+        assert not db.tenant_registry.is_open(gym)
+
+
+def test_admin_token_is_global_across_tenants(gym, monkeypatch):
+    monkeypatch.setenv(ADMIN_TOKEN_ENV, TOKEN)
+    provision_tenant("gym-sur")
+    payload = {"name": "Plancha global", "pattern": "core"}
+    try:
+        with TestClient(app) as client:
+            for tenant in (gym, "gym-sur"):
+                headers = {"X-Athletica-Tenant": tenant}
+                assert client.post("/api/admin/exercises", json=payload, headers=headers).status_code == 403
+                created = client.post(
+                    "/api/admin/exercises", json=payload, headers={**headers, "X-Admin-Token": TOKEN}
+                )
+                assert created.status_code == 201
+    finally:
+        db.tenant_registry.close("gym-sur")
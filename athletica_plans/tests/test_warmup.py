@@ -0,0 +1,52 @@
+from fastapi.testclient import TestClient
+
+from app import warmup
+from app.main import app
+
+
+def test_ready_reports_warmup_timing(monkeypatch):
+    # Estado propio: el global lo pudo arrancar cualquier test anterior.
+    state = warmup.WarmupState()
+    monkeypatch.setattr(warmup, "warmup_state", state)
+    with TestClient(app) as client:
+        assert client.get("/api/health").json() == {"status": "ok"}
+        assert state.wait(timeout=30)
+
+        response = client.get("/api/ready")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["status"] == "ready"
+        assert body["warmup"]["error"] is None
+        assert body["warmup"]["searches"] == len(warmup.warmup_requests())
+        assert {"catalog", "searches", "program", "suggest", "index_page"} <= set(
+            body["warmup"]["steps_ms"]
+        )
+
+
+def test_ready_is_503_until_warm(monkeypatch):
+    state = warmup.WarmupState()
+    monkeypatch.setattr(warmup, "warmup_state", state)
+    # Sin 'with' no se ejecuta el arranque: el proceso sigue frío.
+    client = TestClient(app)
+    response = client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming"
+
+    warmup.warm_up(state=state)
+    assert client.get("/api/ready").status_code == 200
+
+
+def test_failed_warmup_is_not_ready(monkeypatch):
+    state = warmup.WarmupState()
+    monkeypatch.setattr(warmup, "warmup_state", state)
+
+    def unreadable():
+        raise OSError("database disk image is malformed")
+
+    warmup.warm_up(extra_steps=[("broken", unreadable)], state=state)
+    assert state.finished and state.failed
+
+    response = TestClient(app).get("/api/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "failed"
+    assert "malformed" in response.json()["warmup"]["error"]